@@ -10,6 +10,7 @@ export interface WordTimestamp {
 
 export interface SynthesisResult {
   audio?: string // Base64 encoded WAV
+  uploaded?: boolean // Set when the worker wrote the WAV to the given upload URL instead
   sampleRate?: number
   durationMs?: number
   wordTimestamps?: WordTimestamp[] // Word-level timing for text highlighting
@@ -29,8 +30,11 @@ export interface TTSBackend {
 
   /**
    * Synthesize text to audio.
+   * Backends that support it PUT the WAV to uploadUrl and return `uploaded: true`
+   * instead of inline audio. If that upload fails they return inline audio with
+   * `uploaded: false`, and the caller stores it.
    */
-  synthesize(text: string, voiceId: string): Promise<SynthesisResult>
+  synthesize(text: string, voiceId: string, uploadUrl?: string): Promise<SynthesisResult>
 
   /**
    * List available voices.
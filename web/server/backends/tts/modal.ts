@@ -27,7 +27,7 @@ export class ModalTTSBackend implements TTSBackend {
     this.config = config
   }
 
-  async synthesize(text: string, voiceId: string): Promise<SynthesisResult> {
+  async synthesize(text: string, voiceId: string, uploadUrl?: string): Promise<SynthesisResult> {
     if (!text.trim()) {
       return { error: "Empty text" }
     }
@@ -48,7 +48,7 @@ export class ModalTTSBackend implements TTSBackend {
         method: "POST",
         headers: { "Content-Type": "application/json" },
         body: JSON.stringify({
-          segments: [{ text, voice_id: voiceId }],
+          segments: [{ text, voice_id: voiceId, result_upload_url: uploadUrl }],
         }),
         signal: AbortSignal.timeout(30_000),
       })
@@ -79,6 +79,7 @@ export class ModalTTSBackend implements TTSBackend {
         const data = (await res.json()) as {
           status: string
           audio?: string
+          uploaded?: boolean
           sampleRate?: number
           durationMs?: number
           wordTimestamps?: Array<{ word: string; startMs: number; endMs: number }>
@@ -91,6 +92,7 @@ export class ModalTTSBackend implements TTSBackend {
           }
           return {
             audio: data.audio,
+            uploaded: data.uploaded,
             sampleRate: data.sampleRate,
             durationMs: data.durationMs,
             wordTimestamps: data.wordTimestamps,
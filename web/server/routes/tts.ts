@@ -244,7 +244,25 @@ tts.post("/tts/synthesize", async (c) => {
           return
         }
 
-        const synthesisResult = await tryCatch(backend.synthesize(variationText!, voiceId))
+        const storagePath = `documents/${userId}/${doc.storageId}/audio/${voiceId}/${blockId.replace(/\//g, "_")}.wav`
+
+        // Cloud workers can PUT the WAV straight to storage rather than
+        // returning it base64-encoded through the result payload. Don't hold
+        // up synthesis for the tunnel: without a URL the audio comes back
+        // inline and is saved below.
+        let uploadUrl: string | undefined
+        if (env.BACKEND_MODE !== "local") {
+          const uploadUrlResult = await tryCatch(
+            storage.getPresignedUploadUrl(storagePath, { waitForTunnel: false }),
+          )
+          if (uploadUrlResult.success) {
+            uploadUrl = uploadUrlResult.data.uploadUrl
+          }
+        }
+
+        const synthesisResult = await tryCatch(
+          backend.synthesize(variationText!, voiceId, uploadUrl),
+        )
 
         if (!synthesisResult.success || synthesisResult.data.error) {
           const errorMsg = synthesisResult.success
@@ -262,25 +280,26 @@ tts.post("/tts/synthesize", async (c) => {
 
         const result = synthesisResult.data
 
-        const storagePath = `documents/${userId}/${doc.storageId}/audio/${voiceId}/${blockId.replace(/\//g, "_")}.wav`
-        const audioBuffer = Buffer.from(result.audio!, "base64")
+        if (!result.uploaded) {
+          const audioBuffer = Buffer.from(result.audio!, "base64")
 
-        const saveResult = await tryCatch(
-          storage.saveFile(storagePath, audioBuffer, {
-            contentType: "audio/wav",
-            cacheControl: "public, max-age=31536000, immutable",
-          }),
-        )
+          const saveResult = await tryCatch(
+            storage.saveFile(storagePath, audioBuffer, {
+              contentType: "audio/wav",
+              cacheControl: "public, max-age=31536000, immutable",
+            }),
+          )
 
-        if (!saveResult.success) {
-          event.error = {
-            category: "storage",
-            message: getErrorMessage(saveResult.error),
-            code: "STORAGE_SAVE_ERROR",
+          if (!saveResult.success) {
+            event.error = {
+              category: "storage",
+              message: getErrorMessage(saveResult.error),
+              code: "STORAGE_SAVE_ERROR",
+            }
+            sendEvent({ type: "error", error: "Failed to save audio" })
+            controller.close()
+            return
           }
-          sendEvent({ type: "error", error: "Failed to save audio" })
-          controller.close()
-          return
         }
 
         if (result.wordTimestamps) {
@@ -1,5 +1,6 @@
 import { AwsClient } from "aws4fetch"
 import { readFileSync, existsSync } from "fs"
+import { dirname } from "path"
 import type { PresignedUrlResult } from "../types"
 import type { Storage, SaveFileOptions } from "./types"
 import { getImageMimeType } from "../utils/mime-types"
@@ -47,6 +48,11 @@ export class S3Storage implements Storage {
     return undefined
   }
 
+  /** Whether this deployment mounts the tunnel volume (dev stack with the modal profile) */
+  private expectsTunnel(): boolean {
+    return env.BACKEND_MODE === "modal" && existsSync(dirname(TUNNEL_URL_FILE))
+  }
+
   private async waitForTunnelUrl(maxWaitMs = 30000): Promise<string | undefined> {
     if (env.BACKEND_MODE !== "modal") return undefined
 
@@ -63,12 +69,20 @@ export class S3Storage implements Storage {
   /**
    * Get a presigned URL for uploading to a specific key.
    * In modal mode, uses tunnel URL so external workers can reach MinIO.
+   * With waitForTunnel: false, a tunnel that is mounted but hasn't published
+   * its URL yet throws immediately instead of being waited on.
    */
-  async getPresignedUploadUrl(key: string): Promise<PresignedUrlResult> {
+  async getPresignedUploadUrl(
+    key: string,
+    { waitForTunnel = true }: { waitForTunnel?: boolean } = {},
+  ): Promise<PresignedUrlResult> {
     const expiresInSeconds = 3600 // 1 hour
 
     // In modal mode, use tunnel URL for external worker access
-    const tunnelUrl = await this.waitForTunnelUrl()
+    const tunnelUrl = waitForTunnel ? await this.waitForTunnelUrl() : this.getTunnelUrl()
+    if (!tunnelUrl && !waitForTunnel && this.expectsTunnel()) {
+      throw new Error("Tunnel URL not available yet")
+    }
     if (tunnelUrl) {
       return {
         uploadUrl: `${tunnelUrl}/${this.config.bucket}/${key}`,
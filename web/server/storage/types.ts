@@ -51,8 +51,13 @@ export interface Storage {
    */
   getFileUrl(key: string, internal?: boolean): Promise<string>
 
-  /** Get a presigned URL for uploading a file */
-  getPresignedUploadUrl(key: string): Promise<PresignedUploadResult>
+  /** Get a presigned URL for uploading a file
+   * @param options.waitForTunnel - If false, fail fast instead of waiting for the dev tunnel
+   */
+  getPresignedUploadUrl(
+    key: string,
+    options?: { waitForTunnel?: boolean },
+  ): Promise<PresignedUploadResult>
 
   /** Upload images to {docPath}/images/ and return public URLs */
   uploadImages(
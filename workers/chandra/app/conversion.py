@@ -1,14 +1,22 @@
 """CHANDRA conversion logic using chandra-ocr SDK."""
 import base64
 import io
+from concurrent.futures import Future, ThreadPoolExecutor
 from pathlib import Path
-from typing import TYPE_CHECKING
 
-if TYPE_CHECKING:
-    from vllm import LLM
+import pypdfium2 as pdfium
+from chandra.input import load_image, load_pdf_images, parse_range_str
+from chandra.model.util import scale_to_fit
+from chandra.output import parse_markdown, parse_html, parse_chunks, extract_images
+from chandra.prompts import PROMPT_MAPPING
+from chandra.settings import settings
+from vllm import LLM, SamplingParams
 
 IMAGE_EXTENSIONS = {".png", ".jpg", ".jpeg", ".webp", ".gif", ".tiff", ".tif", ".bmp"}
 
+# Threads parsing/encoding finished pages while the GPU runs the next page
+POSTPROCESS_WORKERS = 2
+
 
 def pil_to_base64(img) -> str:
     """Convert PIL Image to base64 WEBP string (matches chandra SDK format)."""
@@ -19,7 +27,7 @@ def pil_to_base64(img) -> str:
 
 def convert_file_with_llm(
     file_path: Path,
-    llm: "LLM",
+    llm: LLM,
     page_range: str | None = None,
 ) -> dict:
     """
@@ -37,12 +45,8 @@ def convert_file_with_llm(
         raise ValueError(f"Unsupported file type: {suffix}")
 
 
-def _run_inference_with_llm(llm: "LLM", image, prompt: str) -> tuple[str, int]:
+def _run_inference_with_llm(llm: LLM, image, prompt: str) -> tuple[str, int]:
     """Run inference using Qwen3-VL prompt format. Returns (raw_text, token_count)."""
-    from vllm import SamplingParams
-    from chandra.model.util import scale_to_fit
-    from chandra.settings import settings
-
     image = scale_to_fit(image)
 
     formatted_prompt = (
@@ -65,14 +69,12 @@ def _run_inference_with_llm(llm: "LLM", image, prompt: str) -> tuple[str, int]:
     return raw, token_count
 
 
-def _convert_pdf_with_llm(pdf_path: Path, page_range: str | None, llm: "LLM") -> dict:
-    """Convert a PDF file using direct vLLM LLM instance."""
-    import pypdfium2 as pdfium
-    from chandra.input import load_pdf_images, parse_range_str
-    from chandra.output import parse_markdown, parse_html, parse_chunks, extract_images
-    from chandra.prompts import PROMPT_MAPPING
-    from chandra.settings import settings
+def _convert_pdf_with_llm(pdf_path: Path, page_range: str | None, llm: LLM) -> dict:
+    """Convert a PDF file using direct vLLM LLM instance.
 
+    Parsing and image encoding for a page run on a worker thread while the
+    next page is on the GPU; results are collected back in page order.
+    """
     pdf = pdfium.PdfDocument(str(pdf_path))
     page_count = len(pdf)
     pdf.close()
@@ -83,43 +85,46 @@ def _convert_pdf_with_llm(pdf_path: Path, page_range: str | None, llm: "LLM") ->
 
     prompt = PROMPT_MAPPING["ocr_layout"].replace("{bbox_scale}", str(settings.BBOX_SCALE))
 
-    html_parts: list[str] = []
-    markdown_parts: list[str] = []
+    # Written straight into buffers in page order so the joined text isn't
+    # built from a second list of parts
+    html_buf = io.StringIO()
+    markdown_buf = io.StringIO()
     all_chunks: list[dict] = []
     all_images: dict[str, str] = {}
 
-    for idx, img in enumerate(pdf_images):
-        print(f"[chandra] Processing page {idx + 1} of {total_pages}", flush=True)
+    with ThreadPoolExecutor(max_workers=POSTPROCESS_WORKERS) as executor:
+        pending: list[tuple[int, Future]] = []
+        for idx, img in enumerate(pdf_images):
+            print(f"[chandra] Processing page {idx + 1} of {total_pages}", flush=True)
 
-        try:
-            raw, token_count = _run_inference_with_llm(llm, img, prompt)
+            try:
+                raw, token_count = _run_inference_with_llm(llm, img, prompt)
+            except Exception as e:
+                print(f"[chandra] Warning: Page {idx + 1} had an error: {e}", flush=True)
+                continue
 
-            html = parse_html(raw)
-            markdown = parse_markdown(raw)
-            chunks = parse_chunks(raw, img, bbox_scale=settings.BBOX_SCALE)
-            images = extract_images(raw, chunks, img)
+            pending.append((idx, executor.submit(_finalize_page, raw, img, pages[idx])))
+
+        for idx, future in pending:
+            try:
+                html, markdown, chunks, images = future.result()
+            except Exception as e:
+                print(f"[chandra] Warning: Page {idx + 1} had an error: {e}", flush=True)
+                continue
 
             if html:
-                html_parts.append(html)
+                if html_buf.tell():
+                    html_buf.write("\n<hr>\n")
+                html_buf.write(html)
             if markdown:
-                markdown_parts.append(markdown)
-
-            if chunks:
-                for chunk in chunks:
-                    chunk_with_page = dict(chunk)
-                    chunk_with_page["page"] = pages[idx]
-                    all_chunks.append(chunk_with_page)
+                if markdown_buf.tell():
+                    markdown_buf.write("\n\n---\n\n")
+                markdown_buf.write(markdown)
+            all_chunks.extend(chunks)
+            all_images.update(images)
 
-            if images:
-                for name, extracted_img in images.items():
-                    all_images[name] = pil_to_base64(extracted_img)
-
-        except Exception as e:
-            print(f"[chandra] Warning: Page {idx + 1} had an error: {e}", flush=True)
-            continue
-
-    html_content = "\n<hr>\n".join(html_parts)
-    markdown_content = "\n\n---\n\n".join(markdown_parts)
+    html_content = html_buf.getvalue()
+    markdown_content = markdown_buf.getvalue()
 
     return {
         "content": html_content,
@@ -133,13 +138,30 @@ def _convert_pdf_with_llm(pdf_path: Path, page_range: str | None, llm: "LLM") ->
     }
 
 
-def _convert_image_with_llm(image_path: Path, llm: "LLM") -> dict:
-    """Convert a single image file using direct vLLM LLM instance."""
-    from chandra.input import load_image
-    from chandra.output import parse_markdown, parse_html, parse_chunks, extract_images
-    from chandra.prompts import PROMPT_MAPPING
-    from chandra.settings import settings
+def _finalize_page(raw: str, img, page: int) -> tuple[str, str, list[dict], dict[str, str]]:
+    """Parse one page of model output into html, markdown, chunks and encoded images."""
+    html = parse_html(raw)
+    markdown = parse_markdown(raw)
+    chunks = parse_chunks(raw, img, bbox_scale=settings.BBOX_SCALE)
+    images = extract_images(raw, chunks, img)
 
+    page_chunks: list[dict] = []
+    if chunks:
+        for chunk in chunks:
+            chunk_with_page = dict(chunk)
+            chunk_with_page["page"] = page
+            page_chunks.append(chunk_with_page)
+
+    page_images: dict[str, str] = {}
+    if images:
+        for name, extracted_img in images.items():
+            page_images[name] = pil_to_base64(extracted_img)
+
+    return html, markdown, page_chunks, page_images
+
+
+def _convert_image_with_llm(image_path: Path, llm: LLM) -> dict:
+    """Convert a single image file using direct vLLM LLM instance."""
     img = load_image(str(image_path))
     prompt = PROMPT_MAPPING["ocr_layout"].replace("{bbox_scale}", str(settings.BBOX_SCALE))
 
@@ -7,6 +7,7 @@ image = (
     .pip_install(
         "chandra-ocr",
         "httpx",
+        "orjson",
         "vllm>=0.11.0",
         "pydantic",
         "fastapi[standard]",
@@ -25,8 +26,14 @@ app = modal.App("chandra", image=image)
 snapshot_key = "v1"
 
 with image.imports():
+    import httpx
+    import orjson
     from vllm import LLM
 
+    # Pull in chandra-ocr and the conversion helpers at container start so the
+    # first request doesn't pay for them
+    from app.conversion import convert_file_with_llm
+
 
 @app.cls(
     gpu="H100",
@@ -53,6 +60,18 @@ class Chandra:
         )
         print(f"[chandra] Model loaded, snapshotting {snapshot_key}", flush=True)
 
+    @modal.enter()
+    def open_http_client(self):
+        """Create the pooled HTTP client after restore (sockets don't survive snapshots)."""
+        self._http = httpx.Client(
+            follow_redirects=True,
+            limits=httpx.Limits(max_keepalive_connections=8),
+        )
+
+    @modal.exit()
+    def close_http_client(self):
+        self._http.close()
+
     @modal.method()
     def convert(
         self,
@@ -61,26 +80,22 @@ class Chandra:
         page_range: str | None = None,
     ) -> dict:
         """Download file, convert with CHANDRA, upload result to S3."""
-        import json
         import tempfile
         from pathlib import Path
 
-        import httpx
-        from app.conversion import convert_file_with_llm
-
         # Download file
         suffix = Path(file_url.split("?")[0]).suffix or ".pdf"
         with tempfile.NamedTemporaryFile(delete=False, suffix=suffix) as f:
-            r = httpx.get(file_url, follow_redirects=True, timeout=60.0)
+            r = self._http.get(file_url, timeout=60.0)
             r.raise_for_status()
             f.write(r.content)
             path = Path(f.name)
 
         try:
             result = convert_file_with_llm(path, self.llm, page_range)
-            httpx.put(
+            self._http.put(
                 result_upload_url,
-                content=json.dumps(result),
+                content=orjson.dumps(result),
                 headers={"Content-Type": "application/json"},
                 timeout=120.0,
             ).raise_for_status()
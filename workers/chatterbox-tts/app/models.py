@@ -27,6 +27,11 @@ def get_or_create_model() -> "ChatterboxTTS":
     for reuse across all synthesis requests.
     """
     global _model_cache
+    # Lock-free read of the cached model. Unloading rebinds _model_cache to
+    # None rather than deleting the name, so this never hits a missing global
+    model = _model_cache
+    if model is not None:
+        return model
     with _model_lock:
         if _model_cache is None:
             device = get_device()
@@ -55,7 +60,6 @@ def unload_model() -> bool:
             return False
 
         print("[models] Unloading TTS model...", flush=True)
-        del _model_cache
         _model_cache = None
 
         if torch.cuda.is_available():
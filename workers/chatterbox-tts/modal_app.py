@@ -1,5 +1,14 @@
 """Modal worker for Chatterbox TTS."""
+import hashlib
 import modal
+import queue
+import re
+import struct
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+from concurrent.futures import Future
 from pathlib import Path
 
 # Get the path to voices directory relative to this file
@@ -10,7 +19,8 @@ image = (
     .apt_install("build-essential", "ffmpeg", "libsndfile1")
     .pip_install(
         "chatterbox-tts",
-        "scipy",
+        "httpx",
+        "numba",
         "pydantic",
         "fastapi[standard]",
         "huggingface_hub[hf_transfer]",
@@ -30,13 +40,85 @@ app = modal.App("chatterbox-tts", image=image)
 # Change this to invalidate the snapshot cache
 snapshot_key = "v1"
 
+# Combining accents left after NFKD (é -> e + U+0301), dropped to keep the base letter
+_COMBINING_MARKS = re.compile(r"[\u0300-\u036f]")
+# Anything else MMS can't align becomes a word break
+_NON_ALIGNABLE = re.compile(r"[^a-z']+")
+
+# Rendered (voice, text) results kept per container for repeated phrases
+RESULT_CACHE_SIZE = 128
+
+# Alignment micro-batching: clips queued within this window (from any input
+# running on the container) share one MMS forward pass
+ALIGN_BATCH_WINDOW_S = 0.01
+ALIGN_MAX_BATCH = 8
+
+# A "pending" /result answer is reused for this long, so bursts of polls for
+# one call share a control-plane lookup. Kept well under the web server's
+# 500 ms poll interval so a finished segment is never reported late.
+PENDING_TTL_S = 0.1
+
+# Voice configs
+VOICES = {
+    "male_2": {"reference_audio": "/voices/male_2.wav", "exaggeration": 0.25, "post_process": True},
+    "female_1": {"reference_audio": "/voices/female_1.wav", "exaggeration": 0.25, "post_process": False},
+}
+
 # Import in global scope so imports can be snapshot
 with image.imports():
+    import httpx
+    import numpy as np
     import torch
+    import torchaudio
+    from numba import njit
     from chatterbox.tts import ChatterboxTTS as ChatterboxModel
     from torchaudio.pipelines import MMS_FA
 
 
+def _compress_samples(audio, threshold_db, ratio, attack_coef, release_coef):
+    """Feed-forward compressor followed by peak normalization to 0.99.
+
+    Level detection, the attack/release gain smoother and gain application all
+    happen per sample, so the intermediate dB/gain arrays are never built.
+    Plain Python here; load_model compiles it with Numba.
+    """
+    compressed = np.empty_like(audio)
+    slope = 1 - 1 / ratio
+    current = 0.0
+    peak = 0.0
+    for i in range(audio.shape[0]):
+        sample = audio[i]
+        level_db = 20 * np.log10(abs(sample) + 1e-10)
+        target = max(level_db - threshold_db, 0.0) * slope
+        coef = attack_coef if target > current else release_coef
+        current = coef * current + (1 - coef) * target
+        out = sample * 10 ** (-current / 20)
+        compressed[i] = out
+        peak = max(peak, abs(out))
+
+    if peak > 0:
+        scale = 0.99 / peak
+        for i in range(compressed.shape[0]):
+            compressed[i] *= scale
+    return compressed
+
+
+def _cache_key(voice_id: str, text: str) -> bytes:
+    return hashlib.blake2b(f"{voice_id}|{text}".encode(), digest_size=16).digest()
+
+
+def _to_wav_bytes(audio, sr: int) -> bytes:
+    """Encode float audio in [-1, 1] as a mono 16-bit PCM WAV."""
+    pcm = np.clip(audio * 32767, -32768, 32767).astype("<i2")
+    header = struct.pack(
+        "<4sI4s4sIHHIIHH4sI",
+        b"RIFF", 36 + pcm.nbytes, b"WAVE",
+        b"fmt ", 16, 1, 1, sr, sr * 2, 2, 16,
+        b"data", pcm.nbytes,
+    )
+    return header + pcm.tobytes()
+
+
 @app.cls(
     gpu="A10G",
     cpu=2.0,
@@ -45,6 +127,7 @@ with image.imports():
     enable_memory_snapshot=True,
     experimental_options={"enable_gpu_snapshot": True},
 )
+@modal.concurrent(max_inputs=4)
 class ChatterboxTTS:
     """Chatterbox TTS worker with persistent model."""
 
@@ -55,44 +138,143 @@ class ChatterboxTTS:
         self.model = ChatterboxModel.from_pretrained(device)
         print(f"[chatterbox-tts] Model loaded on {device}", flush=True)
 
+        # Encode each reference voice once (load, resample, speaker embedding,
+        # prompt tokens) and keep the conditionals for generate() to reuse
+        self.voice_conds = {}
+        for voice_id, voice in VOICES.items():
+            self.model.prepare_conditionals(
+                voice["reference_audio"], exaggeration=voice["exaggeration"]
+            )
+            self.voice_conds[voice_id] = self.model.conds
+        print(f"[chatterbox-tts] Encoded voices: {list(self.voice_conds)}", flush=True)
+
         print("[chatterbox-tts] Loading MMS alignment model...", flush=True)
-        self.align_model = MMS_FA.get_model().to(device)
-        self.align_tokenizer = MMS_FA.get_tokenizer()
-        self.align_aligner = MMS_FA.get_aligner()
+        # The bundle's wrapper breaks on padded batches: it layer-norms the whole
+        # batch as one tensor (clips are normalized one by one in _align
+        # instead) and its star column only fits batch size 1 (alignment never
+        # targets the star token)
+        self.align_model = MMS_FA.get_model(with_star=False).to(device)
+        self.align_model.normalize_waveform = False
+        # Character -> MMS token id; normalized transcripts only hold a-z and '
+        self.align_token_lut = np.zeros(128, dtype=np.int32)
+        for char, index in MMS_FA.get_dict().items():
+            if len(char) == 1 and ord(char) < 128:
+                self.align_token_lut[ord(char)] = index
         self.align_sample_rate = MMS_FA.sample_rate
         self.device = device
+
+        # Serializes generation (and the shared model state generate() mutates)
+        # so concurrent inputs never interleave on this container's model
+        self._gpu_lock = threading.Lock()
+
+        # LRU of blake2b(voice|text) -> (wav bytes, metadata)
+        self._cache: OrderedDict[bytes, tuple[bytes, dict]] = OrderedDict()
+        self._cache_lock = threading.Lock()
+
+        # Chatterbox always outputs at model.sr; build the 16kHz resampler once
+        # on the GPU instead of recomputing the sinc kernel per request
+        self.resampler = torchaudio.transforms.Resample(
+            self.model.sr, self.align_sample_rate
+        ).to(device)
+
+        # Compile the compressor's per-sample loop now so requests don't pay for it
+        self._compress_samples = njit(cache=True, fastmath=True)(_compress_samples)
+        self._compress_samples(np.zeros(16, dtype=np.float32), -20.0, 4.0, 0.5, 0.5)
         print(f"[chatterbox-tts] Ready, snapshotting {snapshot_key}", flush=True)
 
-    @modal.method()
-    def synthesize(self, text: str, voice_id: str) -> dict:
-        """Synthesize speech from text with word-level timestamps."""
-        import base64
-        import io
-        import numpy as np
-        from scipy.io import wavfile
-
-        # Voice configs
-        voices = {
-            "male_2": {"reference_audio": "/voices/male_2.wav", "exaggeration": 0.25, "post_process": True},
-            "female_1": {"reference_audio": "/voices/female_1.wav", "exaggeration": 0.25, "post_process": False},
-        }
+    @modal.enter()
+    def open_http_client(self):
+        """Create the pooled HTTP client after restore (sockets don't survive snapshots)."""
+        self._http = httpx.Client(limits=httpx.Limits(max_keepalive_connections=8))
 
-        if voice_id not in voices:
-            return {"error": f"Unknown voice: {voice_id}. Available: {list(voices.keys())}"}
+    @modal.exit()
+    def close_http_client(self):
+        self._http.close()
 
-        voice = voices[voice_id]
+    @modal.enter()
+    def start_align_batcher(self):
+        """Start the alignment batching thread after restore (threads don't survive snapshots)."""
+        self._align_queue: queue.Queue = queue.Queue()
+        self._align_thread = threading.Thread(target=self._run_align_batcher, daemon=True)
+        self._align_thread.start()
 
-        # Generate audio
-        wav = self.model.generate(
-            text,
-            audio_prompt_path=voice["reference_audio"],
-            exaggeration=voice["exaggeration"],
-        )
-        audio_tensor = wav.squeeze(0)
-        sr = self.model.sr
+    @modal.exit()
+    def stop_align_batcher(self):
+        self._align_queue.put(None)
+        self._align_thread.join(timeout=5)
+
+    @modal.method()
+    def synthesize(self, text: str, voice_id: str, result_upload_url: str | None = None) -> dict:
+        """Synthesize speech from text with word-level timestamps.
+
+        With result_upload_url, the WAV is PUT there and only metadata is returned.
+        """
+        if voice_id not in VOICES:
+            return {"error": f"Unknown voice: {voice_id}. Available: {list(VOICES.keys())}"}
+
+        key = _cache_key(voice_id, text)
+        rendered = self._cache_get(key)
+        if rendered is None:
+            rendered = self._render(text, voice_id)
+            self._cache_put(key, rendered)
+
+        return self._deliver(rendered, result_upload_url)
+
+    def _cache_get(self, key: bytes) -> tuple[bytes, dict] | None:
+        with self._cache_lock:
+            cached = self._cache.get(key)
+            if cached is not None:
+                self._cache.move_to_end(key)
+            return cached
+
+    def _cache_put(self, key: bytes, rendered: tuple[bytes, dict]) -> None:
+        with self._cache_lock:
+            self._cache[key] = rendered
+            if len(self._cache) > RESULT_CACHE_SIZE:
+                self._cache.popitem(last=False)
+
+    def _deliver(self, rendered: tuple[bytes, dict], result_upload_url: str | None) -> dict:
+        """Upload the WAV when given a URL, otherwise inline it as base64.
+
+        A failed upload falls back to inlining, so the caller can still store
+        the audio itself instead of losing the segment.
+        """
+        import base64
 
-        # Get word timestamps using MMS alignment
-        word_timestamps = self._get_word_timestamps(audio_tensor, text, sr)
+        wav_bytes, metadata = rendered
+        result = dict(metadata)
+        if result_upload_url:
+            try:
+                self._http.put(
+                    result_upload_url,
+                    content=wav_bytes,
+                    headers={
+                        "Content-Type": "audio/wav",
+                        "Cache-Control": "public, max-age=31536000, immutable",
+                    },
+                    timeout=60.0,
+                ).raise_for_status()
+                result["uploaded"] = True
+                return result
+            except httpx.HTTPError as e:
+                print(f"[chatterbox-tts] Warning: result upload failed, returning audio inline: {e}", flush=True)
+
+        result["uploaded"] = False
+        result["audio"] = base64.b64encode(wav_bytes).decode("utf-8")
+        return result
+
+    def _render(self, text: str, voice_id: str) -> tuple[bytes, dict]:
+        """Generate, align and post-process one segment. Returns (wav_bytes, metadata)."""
+        voice = VOICES[voice_id]
+        with self._gpu_lock:
+            # Swap in the voice's precomputed conditionals
+            self.model.conds = self.voice_conds[voice_id]
+            audio_tensor = self.model.generate(text, exaggeration=voice["exaggeration"]).squeeze(0)
+            sr = self.model.sr
+
+        # Get word timestamps using MMS alignment; runs outside the lock so the
+        # next input can generate meanwhile
+        word_timestamps = self._align(audio_tensor, text, sr)
 
         # Convert to numpy
         audio = audio_tensor.numpy()
@@ -104,74 +286,105 @@ class ChatterboxTTS:
         # Calculate duration
         duration_ms = len(audio) / sr * 1000
 
-        # Convert to WAV bytes
-        audio_int16 = (audio * 32767).astype(np.int16)
-        buffer = io.BytesIO()
-        wavfile.write(buffer, sr, audio_int16)
-        wav_bytes = buffer.getvalue()
-
-        return {
-            "audio": base64.b64encode(wav_bytes).decode("utf-8"),
+        metadata = {
             "sampleRate": sr,
             "durationMs": duration_ms,
             "wordTimestamps": word_timestamps,
         }
+        return _to_wav_bytes(audio, sr), metadata
 
-    def _get_word_timestamps(self, audio_tensor, text: str, sr: int) -> list[dict]:
-        """Compute word-level timestamps using MMS alignment."""
-        import torchaudio.functional as F
-
-        # Resample to MMS sample rate (16kHz)
+    def _align(self, audio_tensor, text: str, sr: int) -> list[dict]:
+        """Compute word-level timestamps for one clip via the alignment batcher."""
+        # Move to the alignment device and resample to MMS sample rate (16kHz)
+        waveform = audio_tensor.to(self.device)
         if sr != self.align_sample_rate:
-            audio_resampled = F.resample(audio_tensor.unsqueeze(0), sr, self.align_sample_rate).squeeze(0)
-        else:
-            audio_resampled = audio_tensor
-
-        # Ensure correct shape [1, T]
-        if audio_resampled.dim() == 1:
-            audio_resampled = audio_resampled.unsqueeze(0)
-
-        waveform = audio_resampled.to(self.device)
-
-        # Generate emissions
-        with torch.inference_mode():
-            emission, _ = self.align_model(waveform)
+            waveform = self.resampler(waveform)
+        waveform = torch.nn.functional.layer_norm(waveform, waveform.shape)
+
+        future: Future = Future()
+        self._align_queue.put((waveform, future))
+        return self._word_timestamps(future.result(), waveform.shape[-1], text)
+
+    def _run_align_batcher(self):
+        """Coalesce queued clips into padded MMS batches until a None sentinel arrives."""
+        from torch.nn.utils.rnn import pad_sequence
+
+        stopping = False
+        while not stopping:
+            item = self._align_queue.get()
+            if item is None:
+                return
+            pending = [item]
+
+            # Give other inputs a moment to queue their clips
+            deadline = time.monotonic() + ALIGN_BATCH_WINDOW_S
+            while len(pending) < ALIGN_MAX_BATCH:
+                try:
+                    item = self._align_queue.get(timeout=max(0.0, deadline - time.monotonic()))
+                except queue.Empty:
+                    break
+                if item is None:
+                    stopping = True
+                    break
+                pending.append(item)
+
+            waveforms = [waveform for waveform, _ in pending]
+            try:
+                lengths = torch.tensor([w.shape[-1] for w in waveforms], device=self.device)
+                batch = pad_sequence(waveforms, batch_first=True)
+
+                # Generate emissions; padded frames are cut off per row
+                with torch.inference_mode():
+                    emissions, emission_lengths = self.align_model(batch, lengths)
+            except Exception as e:
+                for _, future in pending:
+                    future.set_exception(e)
+                continue
+
+            for i, (_, future) in enumerate(pending):
+                future.set_result(emissions[i : i + 1, : emission_lengths[i]])
+
+    def _word_timestamps(self, emission, num_samples: int, text: str) -> list[dict]:
+        """Force-align text against one clip's emissions and return word timings."""
+        import torchaudio.functional as F
 
-        # Normalize text: MMS expects lowercase, only a-z and apostrophe
-        normalized = text.lower()
-        normalized = "".join(c if c.isalpha() or c in "' " else " " for c in normalized)
-        words = normalized.split()
+        # Normalize text: MMS expects lowercase, only a-z and apostrophe.
+        # Accents are folded to their base letter first (é -> e).
+        folded = _COMBINING_MARKS.sub("", unicodedata.normalize("NFKD", text))
+        words = _NON_ALIGNABLE.sub(" ", folded.lower()).split()
 
         if not words:
             return []
 
-        # Tokenize and align using bundle's high-level APIs
-        tokens = self.align_tokenizer(words)
-        token_spans = self.align_aligner(emission[0], tokens)
+        # Tokenize every character through the lookup table, then force-align
+        # them all in one pass
+        chars = np.frombuffer("".join(words).encode("ascii"), dtype=np.uint8)
+        targets = torch.from_numpy(self.align_token_lut[chars]).unsqueeze(0).to(self.device)
+        alignments, _ = F.forced_align(emission, targets, blank=0)
+        frames = alignments[0].cpu().numpy()
+
+        # Each character is a run of its label in the frame path; runs of the
+        # blank label (0) sit between them. Boundaries are where the label changes.
+        bounds = np.flatnonzero(np.diff(frames, prepend=-1, append=-1))
+        run_starts, run_ends = bounds[:-1], bounds[1:]
+        is_char = frames[run_starts] != 0
+        char_starts, char_ends = run_starts[is_char], run_ends[is_char]
+
+        # A word spans from its first character's start to its last character's end
+        word_lens = np.fromiter((len(w) for w in words), dtype=np.int64, count=len(words))
+        last_char = np.cumsum(word_lens) - 1
+        first_char = last_char - word_lens + 1
 
         # Convert frame indices to milliseconds
         num_frames = emission.shape[1]
-        ratio = waveform.shape[1] / num_frames / self.align_sample_rate
-
-        results = []
-        for i, span in enumerate(token_spans):
-            # Handle both single TokenSpan and list of TokenSpans per word
-            if isinstance(span, list):
-                word_start = span[0].start if span else 0
-                word_end = span[-1].end if span else 0
-            else:
-                word_start = span.start
-                word_end = span.end
-
-            start_ms = word_start * ratio * 1000
-            end_ms = word_end * ratio * 1000
-            results.append({
-                "word": words[i],
-                "startMs": round(start_ms, 1),
-                "endMs": round(end_ms, 1),
-            })
-
-        return results
+        ms_per_frame = num_samples / num_frames / self.align_sample_rate * 1000
+        start_ms = np.round(char_starts[first_char] * ms_per_frame, 1).tolist()
+        end_ms = np.round(char_ends[last_char] * ms_per_frame, 1).tolist()
+
+        return [
+            {"word": word, "startMs": start, "endMs": end}
+            for word, start, end in zip(words, start_ms, end_ms)
+        ]
 
     def _compress(
         self,
@@ -183,31 +396,19 @@ class ChatterboxTTS:
         release_ms: float = 50,
     ):
         """Apply dynamic range compression."""
-        import numpy as np
+        attack_coef = np.exp(-1 / (attack_ms / 1000 * sr)) if attack_ms > 0 else 0.0
+        release_coef = np.exp(-1 / (release_ms / 1000 * sr)) if release_ms > 0 else 0.0
 
-        eps = 1e-10
-        audio_db = 20 * np.log10(np.abs(audio) + eps)
-        over_threshold = np.maximum(audio_db - threshold_db, 0)
-        gain_reduction_db = over_threshold * (1 - 1 / ratio)
-
-        attack_coef = np.exp(-1 / (attack_ms / 1000 * sr)) if attack_ms > 0 else 0
-        release_coef = np.exp(-1 / (release_ms / 1000 * sr)) if release_ms > 0 else 0
-
-        smoothed_gr = np.zeros_like(gain_reduction_db)
-        current = 0.0
-        for i in range(len(gain_reduction_db)):
-            target = gain_reduction_db[i]
-            coef = attack_coef if target > current else release_coef
-            current = coef * current + (1 - coef) * target
-            smoothed_gr[i] = current
-
-        compressed = audio * 10 ** (-smoothed_gr / 20)
-        return compressed / np.max(np.abs(compressed)) * 0.99
+        return self._compress_samples(
+            audio, float(threshold_db), float(ratio), float(attack_coef), float(release_coef)
+        )
 
 
 @app.function()
 @modal.asgi_app()
 def api():
+    import asyncio
+
     from fastapi import FastAPI
     from pydantic import BaseModel
 
@@ -215,29 +416,44 @@ def api():
     worker = ChatterboxTTS()
 
     class SynthesizeRequest(BaseModel):
-        segments: list[dict]  # [{text, voice_id}, ...]
+        segments: list[dict]  # [{text, voice_id, result_upload_url?}, ...]
 
     @web.post("/synthesize")
     async def synthesize(req: SynthesizeRequest):
         """Spawn all segments in parallel."""
-        calls = []
-        for seg in req.segments:
-            call = await worker.synthesize.spawn.aio(
+        # Issue every spawn at once rather than one control-plane round trip
+        # per segment; gather keeps the call IDs in segment order
+        calls = await asyncio.gather(*(
+            worker.synthesize.spawn.aio(
                 seg.get("text", ""),
                 seg.get("voice_id", "female_1"),
+                seg.get("result_upload_url"),
             )
-            calls.append(call.object_id)
-        return {"call_ids": calls}
+            for seg in req.segments
+        ))
+        return {"call_ids": [call.object_id for call in calls]}
+
+    # call_id -> expiry of its last "pending" answer
+    pending: dict[str, float] = {}
 
     @web.get("/result/{call_id}")
     async def result(call_id: str):
+        now = time.monotonic()
+        if pending.get(call_id, 0.0) > now:
+            return {"status": "pending"}
+
         fc = modal.FunctionCall.from_id(call_id)
         try:
             out = await fc.get.aio(timeout=0)
-            return {"status": "completed", **out}
         except TimeoutError:
+            pending[call_id] = now + PENDING_TTL_S
             return {"status": "pending"}
 
+        # Forget expired pending entries, including this call's
+        for key in [k for k, expiry in pending.items() if expiry <= now]:
+            del pending[key]
+        return {"status": "completed", **out}
+
     @web.get("/voices")
     async def voices():
         return {"voices": [
@@ -2,15 +2,16 @@
 from pathlib import Path
 from typing import TYPE_CHECKING
 
+import pypdfium2 as pdfium
 from PIL import Image
 
 from .markdown_utils import (
-    pil_to_base64,
+    pil_to_inference_base64,
     resize_image_for_inference,
     render_pdf_page,
-    get_pdf_page_count,
     parse_bbox_from_markdown,
-    extract_images_from_pdf,
+    renumber_images,
+    crop_images,
     markdown_to_html,
     parse_page_range,
 )
@@ -20,6 +21,8 @@ if TYPE_CHECKING:
 
 
 IMAGE_EXTENSIONS = {".png", ".jpg", ".jpeg", ".webp", ".gif", ".tiff", ".tif", ".bmp"}
+# Pages rendered and sent to vLLM together, so its scheduler can batch them
+PAGE_BATCH_SIZE = 8
 
 
 def convert_file(file_path: Path, page_range: str | None = None) -> dict:
@@ -44,16 +47,16 @@ def convert_file(file_path: Path, page_range: str | None = None) -> dict:
         }
     """
     # Import here to avoid import errors when using convert_file_with_llm
-    from .vllm_client import run_inference
+    from .vllm_client import run_inference_batch
 
-    return _convert_file_internal(file_path, page_range, run_inference)
+    return _convert_file_internal(file_path, page_range, run_inference_batch)
 
 
 def convert_image(file_path: Path) -> dict:
     """Convert a single image file using LightOnOCR via HTTP API."""
-    from .vllm_client import run_inference
+    from .vllm_client import run_inference_batch
 
-    return _convert_image(file_path, run_inference)
+    return _convert_image(file_path, run_inference_batch)
 
 
 def convert_file_with_llm(
@@ -66,33 +69,36 @@ def convert_file_with_llm(
 
     Used by Modal worker where LLM is loaded as a class attribute.
     """
-    def inference_fn(image_base64: str) -> str:
-        return _run_inference_with_llm(llm, image_base64)
+    def inference_fn(images_base64: list[str]) -> list[str]:
+        return _run_inference_with_llm(llm, images_base64)
 
     return _convert_file_internal(file_path, page_range, inference_fn)
 
 
-def _run_inference_with_llm(llm: "LLM", image_base64: str) -> str:
-    """Run inference using direct vLLM LLM instance."""
+def _run_inference_with_llm(llm: "LLM", images_base64: list[str]) -> list[str]:
+    """Run inference on a batch of page images using direct vLLM LLM instance."""
     from vllm import SamplingParams
 
-    messages = [{
-        "role": "user",
-        "content": [{
-            "type": "image_url",
-            "image_url": {"url": f"data:image/png;base64,{image_base64}"}
+    conversations = [
+        [{
+            "role": "user",
+            "content": [{
+                "type": "image_url",
+                "image_url": {"url": f"data:image/jpeg;base64,{image_base64}"}
+            }]
         }]
-    }]
+        for image_base64 in images_base64
+    ]
 
     outputs = llm.chat(
-        messages=[messages],
+        messages=conversations,
         sampling_params=SamplingParams(
             max_tokens=4096,
             temperature=0.2,
             top_p=0.9,
         ),
     )
-    return outputs[0].outputs[0].text
+    return [output.outputs[0].text for output in outputs]
 
 
 def _convert_file_internal(
@@ -106,7 +112,8 @@ def _convert_file_internal(
     Args:
         file_path: Path to PDF or image file
         page_range: Optional page range string like "1-5" or "1,3,5"
-        inference_fn: Function that takes base64 image and returns markdown text
+        inference_fn: Function that takes a list of base64 images and returns
+            their markdown texts in the same order
     """
     suffix = file_path.suffix.lower()
 
@@ -120,46 +127,44 @@ def _convert_file_internal(
 
 def _convert_pdf(pdf_path: Path, page_range: str | None, inference_fn) -> dict:
     """Convert a PDF file."""
-    total_pages = get_pdf_page_count(pdf_path)
+    pdf = pdfium.PdfDocument(str(pdf_path))
+    try:
+        return _convert_pdf_pages(pdf, page_range, inference_fn)
+    finally:
+        pdf.close()
+
+
+def _convert_pdf_pages(pdf: pdfium.PdfDocument, page_range: str | None, inference_fn) -> dict:
+    """Convert pages of an open PDF document."""
+    total_pages = len(pdf)
     pages = parse_page_range(page_range, total_pages)
 
     markdown_parts: list[str] = []
     all_images: dict[str, str] = {}
     image_counter = 0
 
-    for page_idx in pages:
-        # Render page to image
-        page_image = render_pdf_page(pdf_path, page_idx)
-        page_image = resize_image_for_inference(page_image)
-
-        # Run OCR inference
-        image_b64 = pil_to_base64(page_image)
-        raw_markdown = inference_fn(image_b64)
-
-        # Parse bbox annotations and extract images
-        cleaned_md, bboxes = parse_bbox_from_markdown(raw_markdown)
+    for start in range(0, len(pages), PAGE_BATCH_SIZE):
+        # Render a batch of pages to images
+        page_images = [render_pdf_page(pdf, page_idx) for page_idx in pages[start:start + PAGE_BATCH_SIZE]]
 
-        # Renumber images to be globally unique across pages
-        if bboxes:
-            renumbered_bboxes: dict[str, list[int]] = {}
-            md_with_renumbered = cleaned_md
+        # Run OCR inference on the whole batch
+        raw_markdowns = inference_fn([
+            pil_to_inference_base64(resize_image_for_inference(page_image)) for page_image in page_images
+        ])
 
-            for old_name, coords in bboxes.items():
-                image_counter += 1
-                new_name = f"image_{image_counter}.png"
-                renumbered_bboxes[new_name] = coords
-                md_with_renumbered = md_with_renumbered.replace(
-                    f"![image]({old_name})",
-                    f"![image]({new_name})"
-                )
+        for page_image, raw_markdown in zip(page_images, raw_markdowns):
+            # Parse bbox annotations and extract images
+            cleaned_md, bboxes = parse_bbox_from_markdown(raw_markdown)
 
-            cleaned_md = md_with_renumbered
+            # Renumber images to be globally unique across pages
+            if bboxes:
+                cleaned_md, renumbered_bboxes = renumber_images(cleaned_md, bboxes, image_counter)
+                image_counter += len(bboxes)
 
-            # Extract actual images from PDF
-            extracted = extract_images_from_pdf(pdf_path, page_idx, renumbered_bboxes)
-            all_images.update(extracted)
+                # Crop images from the full-resolution render
+                all_images.update(crop_images(page_image, renumbered_bboxes))
 
-        markdown_parts.append(cleaned_md)
+            markdown_parts.append(cleaned_md)
 
     # Combine all pages
     markdown_content = "\n\n---\n\n".join(markdown_parts)
@@ -184,8 +189,8 @@ def _convert_image(image_path: Path, inference_fn) -> dict:
     img = resize_image_for_inference(img)
 
     # Run OCR inference
-    image_b64 = pil_to_base64(img)
-    raw_markdown = inference_fn(image_b64)
+    image_b64 = pil_to_inference_base64(img)
+    raw_markdown = inference_fn([image_b64])[0]
 
     # Parse bbox annotations
     # Note: For single images, we can't extract embedded images since there's no PDF
@@ -197,27 +202,8 @@ def _convert_image(image_path: Path, inference_fn) -> dict:
     all_images: dict[str, str] = {}
     if bboxes:
         # Renumber and extract from the source image
-        image_counter = 0
-        for old_name, coords in bboxes.items():
-            image_counter += 1
-            new_name = f"image_{image_counter}.png"
-            cleaned_md = cleaned_md.replace(
-                f"![image]({old_name})",
-                f"![image]({new_name})"
-            )
-
-            # Extract region from source image
-            x1 = int(coords[0] / 1000 * img.width)
-            y1 = int(coords[1] / 1000 * img.height)
-            x2 = int(coords[2] / 1000 * img.width)
-            y2 = int(coords[3] / 1000 * img.height)
-
-            x1, x2 = min(x1, x2), max(x1, x2)
-            y1, y2 = min(y1, y2), max(y1, y2)
-
-            if x2 - x1 > 0 and y2 - y1 > 0:
-                crop = img.crop((x1, y1, x2, y2))
-                all_images[new_name] = pil_to_base64(crop)
+        cleaned_md, renumbered_bboxes = renumber_images(cleaned_md, bboxes, 0)
+        all_images.update(crop_images(img, renumbered_bboxes))
 
     html_content = markdown_to_html(cleaned_md)
 
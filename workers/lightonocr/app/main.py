@@ -1,21 +1,26 @@
 """LightOnOCR worker with job-based API and SSE streaming."""
 import asyncio
-import json
 import tempfile
 import uuid
 from dataclasses import dataclass, field
 from enum import Enum
 from pathlib import Path
-from typing import Any, AsyncGenerator
+from typing import TYPE_CHECKING, Any, AsyncGenerator
 
 import httpx
+import orjson
+from cachetools import TTLCache
 from fastapi import FastAPI, HTTPException, Query
-from fastapi.responses import JSONResponse
+from fastapi.responses import ORJSONResponse
 from sse_starlette.sse import EventSourceResponse
 
 from .conversion import convert_image
 from .utils import get_suffix
 
+if TYPE_CHECKING:
+    import pypdfium2 as pdfium
+    from PIL import Image
+
 
 class JobStatus(str, Enum):
     PENDING = "pending"
@@ -39,8 +44,18 @@ class Job:
     events: asyncio.Queue = field(default_factory=asyncio.Queue)
 
 
-jobs: dict[str, Job] = {}
-app = FastAPI()
+# Jobs still running live in a plain dict and are never evicted. When
+# process_job ends they move to a bounded TTL cache, so finished results stay
+# readable for an hour without accumulating for the life of the process.
+# Only touched from the event loop thread.
+active_jobs: dict[str, Job] = {}
+finished_jobs: TTLCache[str, Job] = TTLCache(maxsize=1024, ttl=3600)
+app = FastAPI(default_response_class=ORJSONResponse)
+
+
+def get_job(job_id: str) -> Job | None:
+    """Look up a job whether it is still running or already finished."""
+    return active_jobs.get(job_id) or finished_jobs.get(job_id)
 
 
 @app.get("/health")
@@ -49,11 +64,16 @@ async def health():
 
 
 IMAGE_EXTENSIONS = {".png", ".jpg", ".jpeg", ".webp", ".gif", ".tiff", ".tif", ".bmp"}
+DOWNLOAD_CHUNK_SIZE = 1 << 16
+# Pages buffered between pipeline stages
+PIPELINE_DEPTH = 2
+# OCR requests kept in flight so the vLLM server can batch pages
+MAX_INFLIGHT_PAGES = 8
 
 
 async def emit_event(job: Job, event: str, data: dict[str, Any]):
     """Emit an SSE event to the job's queue."""
-    await job.events.put({"event": event, "data": json.dumps(data)})
+    await job.events.put({"event": event, "data": orjson.dumps(data).decode()})
 
 
 async def process_job(job: Job):
@@ -68,12 +88,14 @@ async def process_job(job: Job):
     try:
         await emit_event(job, "progress", {"stage": "Downloading file", "current": 0, "total": 1})
 
+        # Stream to disk in chunks so large PDFs never sit fully in memory
         with tempfile.NamedTemporaryFile(delete=False, suffix=suffix) as f:
-            async with httpx.AsyncClient(follow_redirects=True, timeout=60.0) as client:
-                response = await client.get(job.file_url)
-                response.raise_for_status()
-                f.write(response.content)
             temp_path = Path(f.name)
+            async with httpx.AsyncClient(follow_redirects=True, timeout=60.0) as client:
+                async with client.stream("GET", job.file_url) as response:
+                    response.raise_for_status()
+                    async for chunk in response.aiter_bytes(DOWNLOAD_CHUNK_SIZE):
+                        f.write(chunk)
 
         # Process based on file type
         if suffix == ".pdf":
@@ -109,38 +131,97 @@ async def process_job(job: Job):
     finally:
         if temp_path:
             temp_path.unlink(missing_ok=True)
+        # Only now can the job expire from the cache
+        finished_jobs[job.job_id] = active_jobs.pop(job.job_id, job)
 
 
 async def process_pdf_with_streaming(job: Job, pdf_path: Path):
-    """Process a PDF file with per-page progress events."""
-    loop = asyncio.get_event_loop()
+    """Process a PDF file with per-page progress events.
 
-    # Get total pages and parse page range
-    from .markdown_utils import get_pdf_page_count, parse_page_range
-    total_pages = get_pdf_page_count(pdf_path)
-    pages = parse_page_range(job.page_range, total_pages)
+    Pages flow through three stages joined by small queues, so upcoming pages
+    are rendered and finished pages post-processed while vLLM works on the
+    current ones: render (pdfium, resize, encode) -> inference -> post-process.
+    Up to MAX_INFLIGHT_PAGES inference requests run at once; vLLM batches
+    them, and post-processing still consumes pages in order.
+    """
+    loop = asyncio.get_running_loop()
+
+    # Open the PDF once for all pages; get total pages and parse page range
+    import pypdfium2 as pdfium
+    from .markdown_utils import parse_page_range
+    from .vllm_client import run_inference_async
+    from .vllm_manager import ensure_vllm_ready
+    pdf = pdfium.PdfDocument(str(pdf_path))
+    try:
+        pages = parse_page_range(job.page_range, len(pdf))
+    except ValueError:
+        pdf.close()
+        raise
+
+    rendered: asyncio.Queue = asyncio.Queue(maxsize=PIPELINE_DEPTH)
+    # Holds (page image, inference task) in page order; its size caps the
+    # number of requests in flight
+    inferred: asyncio.Queue = asyncio.Queue(maxsize=MAX_INFLIGHT_PAGES)
+    completed_pages = 0
 
     markdown_parts: list[str] = []
     all_images: dict[str, str] = {}
-    image_counter = 0
 
-    for idx, page_idx in enumerate(pages):
-        # Emit progress for each page
+    async def render_stage():
+        # The only stage that touches pdfium, which isn't thread-safe; pages
+        # render one at a time
+        for page_idx in pages:
+            page = await loop.run_in_executor(None, render_pdf_page_for_inference, pdf, page_idx)
+            await rendered.put(page)
+        await rendered.put(None)
+
+    async def infer_page(client: httpx.AsyncClient, image_b64: str) -> str:
+        nonlocal completed_pages
+        raw_markdown = await run_inference_async(client, image_b64)
+
+        # Emit progress for each page as its inference finishes
+        completed_pages += 1
         job.progress = {
             "stage": "OCR inference",
-            "current": idx + 1,
+            "current": completed_pages,
             "total": len(pages),
         }
         await emit_event(job, "progress", job.progress)
+        return raw_markdown
+
+    async def inference_stage(tg: asyncio.TaskGroup, client: httpx.AsyncClient):
+        while (page := await rendered.get()) is not None:
+            page_image, image_b64 = page
+            await inferred.put((page_image, tg.create_task(infer_page(client, image_b64))))
+        await inferred.put(None)
+
+    async def postprocess_stage():
+        # Tasks are queued in page order, so image numbering stays sequential
+        image_counter = 0
+        while (item := await inferred.get()) is not None:
+            page_image, inference = item
+            raw_markdown = await inference
+            page_result = await loop.run_in_executor(
+                None, finalize_pdf_page, page_image, raw_markdown, image_counter
+            )
+            markdown_parts.append(page_result["markdown"])
+            all_images.update(page_result["images"])
+            image_counter = page_result["next_image_counter"]
 
-        # Process single page in thread pool
-        page_result = await loop.run_in_executor(
-            None, convert_pdf_page, pdf_path, page_idx, image_counter
-        )
-
-        markdown_parts.append(page_result["markdown"])
-        all_images.update(page_result["images"])
-        image_counter = page_result["next_image_counter"]
+    try:
+        # Ensure vLLM is running (no-op if already running)
+        await loop.run_in_executor(None, ensure_vllm_ready)
+
+        async with httpx.AsyncClient() as client:
+            async with asyncio.TaskGroup() as tg:
+                tg.create_task(render_stage())
+                tg.create_task(inference_stage(tg, client))
+                tg.create_task(postprocess_stage())
+    except* Exception as eg:
+        # Surface the failing stage's error itself to process_job's handlers
+        raise eg.exceptions[0]
+    finally:
+        pdf.close()
 
     # Combine all pages
     from .markdown_utils import markdown_to_html
@@ -168,24 +249,20 @@ async def process_pdf_with_streaming(job: Job, pdf_path: Path):
     await emit_event(job, "completed", job.result)
 
 
-def convert_pdf_page(pdf_path: Path, page_idx: int, image_counter: int) -> dict:
-    """Convert a single PDF page (runs in thread pool)."""
-    from .markdown_utils import (
-        render_pdf_page,
-        resize_image_for_inference,
-        pil_to_base64,
-        parse_bbox_from_markdown,
-        extract_images_from_pdf,
-    )
-    from .vllm_client import run_inference
+def render_pdf_page_for_inference(
+    pdf: "pdfium.PdfDocument", page_idx: int
+) -> tuple["Image.Image", str]:
+    """Render a page (runs in thread pool). Returns (full-res page, resized base64 for OCR)."""
+    from .markdown_utils import render_pdf_page, resize_image_for_inference, pil_to_inference_base64
+
+    page_image = render_pdf_page(pdf, page_idx)
+    image_b64 = pil_to_inference_base64(resize_image_for_inference(page_image))
+    return page_image, image_b64
 
-    # Render page to image
-    page_image = render_pdf_page(pdf_path, page_idx)
-    page_image = resize_image_for_inference(page_image)
 
-    # Run OCR inference
-    image_b64 = pil_to_base64(page_image)
-    raw_markdown = run_inference(image_b64)
+def finalize_pdf_page(page_image: "Image.Image", raw_markdown: str, image_counter: int) -> dict:
+    """Parse one page's OCR output and crop its images (runs in thread pool)."""
+    from .markdown_utils import parse_bbox_from_markdown, renumber_images, crop_images
 
     # Parse bbox annotations and extract images
     cleaned_md, bboxes = parse_bbox_from_markdown(raw_markdown)
@@ -194,23 +271,11 @@ def convert_pdf_page(pdf_path: Path, page_idx: int, image_counter: int) -> dict:
 
     # Renumber images to be globally unique across pages
     if bboxes:
-        renumbered_bboxes: dict[str, list[int]] = {}
-        md_with_renumbered = cleaned_md
-
-        for old_name, coords in bboxes.items():
-            image_counter += 1
-            new_name = f"image_{image_counter}.png"
-            renumbered_bboxes[new_name] = coords
-            md_with_renumbered = md_with_renumbered.replace(
-                f"![image]({old_name})",
-                f"![image]({new_name})"
-            )
-
-        cleaned_md = md_with_renumbered
+        cleaned_md, renumbered_bboxes = renumber_images(cleaned_md, bboxes, image_counter)
+        image_counter += len(bboxes)
 
-        # Extract actual images from PDF
-        extracted = extract_images_from_pdf(pdf_path, page_idx, renumbered_bboxes)
-        all_images.update(extracted)
+        # Crop images from the page already rendered for inference
+        all_images.update(crop_images(page_image, renumbered_bboxes))
 
     return {
         "markdown": cleaned_md,
@@ -236,18 +301,18 @@ async def convert(
     # Create job
     job_id = str(uuid.uuid4())
     job = Job(job_id=job_id, file_url=file_url, mime_type=mime_type, page_range=page_range)
-    jobs[job_id] = job
+    active_jobs[job_id] = job
 
     # Start processing in background
     asyncio.create_task(process_job(job))
 
-    return JSONResponse(content={"job_id": job_id})
+    return ORJSONResponse(content={"job_id": job_id})
 
 
 @app.get("/jobs/{job_id}")
 async def get_job_status(job_id: str):
     """Get the status of a conversion job."""
-    job = jobs.get(job_id)
+    job = get_job(job_id)
     if not job:
         raise HTTPException(status_code=404, detail="Job not found")
 
@@ -270,13 +335,13 @@ async def get_job_status(job_id: str):
     if job.error:
         response["error"] = job.error
 
-    return JSONResponse(content=response)
+    return ORJSONResponse(content=response)
 
 
 @app.get("/jobs/{job_id}/stream")
 async def stream_job(job_id: str):
     """SSE stream for job progress and completion."""
-    job = jobs.get(job_id)
+    job = get_job(job_id)
     if not job:
         raise HTTPException(status_code=404, detail="Job not found")
 
@@ -305,7 +370,7 @@ async def stream_job(job_id: str):
 @app.post("/cancel/{job_id}")
 async def cancel_job(job_id: str):
     """Cancel a job (best effort - may not stop in-progress work)."""
-    job = jobs.get(job_id)
+    job = get_job(job_id)
     if not job:
         raise HTTPException(status_code=404, detail="Job not found")
 
@@ -313,7 +378,7 @@ async def cancel_job(job_id: str):
         job.status = JobStatus.FAILED
         job.error = "Cancelled by user"
 
-    return JSONResponse(content={"cancelled": True})
+    return ORJSONResponse(content={"cancelled": True})
 
 
 @app.post("/load")
@@ -2,7 +2,6 @@
 import base64
 import io
 import re
-from pathlib import Path
 
 import pypdfium2 as pdfium
 from PIL import Image
@@ -11,6 +10,8 @@ import markdown as md
 
 # Maximum longest edge for input images (per LightOnOCR paper)
 MAX_RESOLUTION = 1540
+# JPEG quality for page images sent to the model; extracted figures stay PNG
+INFERENCE_JPEG_QUALITY = 92
 
 
 def pil_to_base64(img: Image.Image, format: str = "PNG") -> str:
@@ -20,6 +21,15 @@ def pil_to_base64(img: Image.Image, format: str = "PNG") -> str:
     return base64.b64encode(buffer.getvalue()).decode("utf-8")
 
 
+def pil_to_inference_base64(img: Image.Image) -> str:
+    """Encode a page image for the model as base64 JPEG (far cheaper than PNG deflate)."""
+    if img.mode != "RGB":
+        img = img.convert("RGB")
+    buffer = io.BytesIO()
+    img.save(buffer, format="JPEG", quality=INFERENCE_JPEG_QUALITY)
+    return base64.b64encode(buffer.getvalue()).decode("utf-8")
+
+
 def resize_image_for_inference(img: Image.Image) -> Image.Image:
     """Resize image so longest edge is at most MAX_RESOLUTION, preserving aspect ratio."""
     width, height = img.size
@@ -34,22 +44,11 @@ def resize_image_for_inference(img: Image.Image) -> Image.Image:
     return img.resize((new_width, new_height), Image.Resampling.LANCZOS)
 
 
-def render_pdf_page(pdf_path: str | Path, page_idx: int, scale: float = 2.0) -> Image.Image:
-    """Render a PDF page to PIL Image."""
-    pdf = pdfium.PdfDocument(str(pdf_path))
+def render_pdf_page(pdf: pdfium.PdfDocument, page_idx: int, scale: float = 2.0) -> Image.Image:
+    """Render a page of an open PDF document to PIL Image."""
     page = pdf[page_idx]
     bitmap = page.render(scale=scale)
-    pil_image = bitmap.to_pil()
-    pdf.close()
-    return pil_image
-
-
-def get_pdf_page_count(pdf_path: str | Path) -> int:
-    """Get total page count from PDF."""
-    pdf = pdfium.PdfDocument(str(pdf_path))
-    count = len(pdf)
-    pdf.close()
-    return count
+    return bitmap.to_pil()
 
 
 def parse_bbox_from_markdown(markdown_text: str) -> tuple[str, dict[str, list[int]]]:
@@ -78,28 +77,46 @@ def parse_bbox_from_markdown(markdown_text: str) -> tuple[str, dict[str, list[in
     return cleaned, bboxes
 
 
-def extract_images_from_pdf(
-    pdf_path: str | Path,
-    page_idx: int,
+_IMAGE_REF = re.compile(r'!\[image\]\((image_\d+\.png)\)')
+
+
+def renumber_images(
+    markdown_text: str,
     bboxes: dict[str, list[int]],
-) -> dict[str, str]:
+    image_counter: int,
+) -> tuple[str, dict[str, list[int]]]:
+    """
+    Rename a page's images to image_{image_counter + 1}.png onwards.
+
+    All references are rewritten in a single pass, so a new name can't be
+    picked up again by a later rename.
+
+    Returns:
+        tuple of (renumbered_markdown, renumbered_bboxes)
+    """
+    mapping = {
+        old_name: f"image_{image_counter + i}.png"
+        for i, old_name in enumerate(bboxes, start=1)
+    }
+    renumbered_bboxes = {mapping[old_name]: coords for old_name, coords in bboxes.items()}
+
+    def replace_match(m: re.Match) -> str:
+        return f'![image]({mapping.get(m.group(1), m.group(1))})'
+
+    return _IMAGE_REF.sub(replace_match, markdown_text), renumbered_bboxes
+
+
+def crop_images(pil_image: Image.Image, bboxes: dict[str, list[int]]) -> dict[str, str]:
     """
-    Extract image regions from PDF page using normalized [0,1000] coordinates.
+    Crop image regions from an already rendered page.
 
     Args:
-        pdf_path: Path to PDF file
-        page_idx: 0-indexed page number
+        pil_image: Rendered page
         bboxes: {"image_1.png": [x1, y1, x2, y2], ...} with coords in [0,1000]
 
     Returns:
         {"image_1.png": "base64_encoded_png", ...}
     """
-    if not bboxes:
-        return {}
-
-    # Render page at high quality for cropping
-    pil_image = render_pdf_page(pdf_path, page_idx, scale=2.0)
-
     images: dict[str, str] = {}
     for name, coords in bboxes.items():
         # Convert from [0,1000] to pixel coordinates
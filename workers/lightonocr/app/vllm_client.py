@@ -1,4 +1,6 @@
 """vLLM client for LightOnOCR inference."""
+from concurrent.futures import ThreadPoolExecutor
+
 import httpx
 from .vllm_manager import ensure_vllm_ready
 
@@ -6,12 +8,29 @@ VLLM_BASE_URL = "http://localhost:8000/v1"
 MODEL_NAME = "lightonocr"
 
 
+def _chat_request(image_base64: str) -> dict:
+    """Build the chat completion request for one page image."""
+    return {
+        "model": MODEL_NAME,
+        "messages": [{
+            "role": "user",
+            "content": [{
+                "type": "image_url",
+                "image_url": {"url": f"data:image/jpeg;base64,{image_base64}"}
+            }]
+        }],
+        "max_tokens": 4096,
+        "temperature": 0.2,
+        "top_p": 0.9,
+    }
+
+
 def run_inference(image_base64: str) -> str:
     """
     Run inference on a single page image via vLLM OpenAI API.
 
     Args:
-        image_base64: Base64-encoded PNG/JPEG image data
+        image_base64: Base64-encoded JPEG image data
 
     Returns:
         Markdown text with optional bbox annotations like:
@@ -22,19 +41,35 @@ def run_inference(image_base64: str) -> str:
 
     response = httpx.post(
         f"{VLLM_BASE_URL}/chat/completions",
-        json={
-            "model": MODEL_NAME,
-            "messages": [{
-                "role": "user",
-                "content": [{
-                    "type": "image_url",
-                    "image_url": {"url": f"data:image/png;base64,{image_base64}"}
-                }]
-            }],
-            "max_tokens": 4096,
-            "temperature": 0.2,
-            "top_p": 0.9,
-        },
+        json=_chat_request(image_base64),
+        timeout=120,
+    )
+    response.raise_for_status()
+    return response.json()["choices"][0]["message"]["content"]
+
+
+def run_inference_batch(images_base64: list[str]) -> list[str]:
+    """
+    Run inference on several page images at once.
+
+    The requests are sent concurrently so the vLLM server batches them.
+    Results are in input order.
+    """
+    if not images_base64:
+        return []
+    with ThreadPoolExecutor(max_workers=len(images_base64)) as pool:
+        return list(pool.map(run_inference, images_base64))
+
+
+async def run_inference_async(client: httpx.AsyncClient, image_base64: str) -> str:
+    """
+    Async variant of run_inference for callers keeping several pages in flight.
+
+    The caller must have ensured vLLM is running.
+    """
+    response = await client.post(
+        f"{VLLM_BASE_URL}/chat/completions",
+        json=_chat_request(image_base64),
         timeout=120,
     )
     response.raise_for_status()
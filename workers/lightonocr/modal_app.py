@@ -13,6 +13,7 @@ image = (
         "pypdfium2",
         "markdown",
         "httpx",
+        "orjson",
         "pydantic",
         "fastapi[standard]",
     )
@@ -60,26 +61,27 @@ class LightOnOCR:
         page_range: str | None = None,
     ) -> dict:
         """Download file, convert with LightOnOCR, upload result to S3."""
-        import json
         import tempfile
         from pathlib import Path
 
         import httpx
+        import orjson
         from app.conversion import convert_file_with_llm
 
         # Download file
         suffix = Path(file_url.split("?")[0]).suffix or ".pdf"
         with tempfile.NamedTemporaryFile(delete=False, suffix=suffix) as f:
-            r = httpx.get(file_url, follow_redirects=True, timeout=60.0)
-            r.raise_for_status()
-            f.write(r.content)
             path = Path(f.name)
+            with httpx.stream("GET", file_url, follow_redirects=True, timeout=60.0) as r:
+                r.raise_for_status()
+                for chunk in r.iter_bytes(1 << 16):
+                    f.write(chunk)
 
         try:
             result = convert_file_with_llm(path, self.llm, page_range)
             httpx.put(
                 result_upload_url,
-                content=json.dumps(result),
+                content=orjson.dumps(result),
                 headers={"Content-Type": "application/json"},
                 timeout=120.0,
             ).raise_for_status()
@@ -2,7 +2,7 @@ from pathlib import Path
 
 from .html_processing import images_to_base64, inject_image_dimensions
 from .models import get_or_create_models
-from ..shared import extract_chunks
+from ..shared import extract_chunks, render_html_and_markdown
 
 
 def _create_converter(
@@ -33,19 +33,15 @@ def _create_converter(
 
 def _render_all_formats(document) -> dict:
     """Run all renderers on the document and return all formats."""
-    from marker.renderers.html import HTMLRenderer
-    from marker.renderers.markdown import MarkdownRenderer
-
-    html_output = HTMLRenderer({"add_block_ids": True})(document)
-    markdown_output = MarkdownRenderer()(document)
+    rendered = render_html_and_markdown(document)
     chunks = extract_chunks(document)
 
     return {
-        "html": html_output.html,
-        "markdown": markdown_output.markdown,
+        "html": rendered["html"],
+        "markdown": rendered["markdown"],
         "chunks": chunks,
-        "images": html_output.images,
-        "metadata": html_output.metadata,
+        "images": rendered["images"],
+        "metadata": rendered["metadata"],
     }
 
 
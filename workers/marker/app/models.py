@@ -12,6 +12,12 @@ def get_or_create_models() -> dict:
     for reuse across all conversions.
     """
     global _model_cache
+    # Fast path without the lock. unload_models() only ever rebinds the global
+    # to None, so this read sees either the models dict or None, and a dict
+    # handed out here stays usable until the caller drops it
+    models = _model_cache
+    if models is not None:
+        return models
     with _model_lock:
         if _model_cache is None:
             print("[models] Loading marker models (this may take a moment)...", flush=True)
@@ -43,7 +49,6 @@ def unload_models() -> bool:
             return False
 
         print("[models] Unloading marker models...", flush=True)
-        del _model_cache
         _model_cache = None
 
         import torch
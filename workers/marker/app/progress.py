@@ -9,6 +9,14 @@ import time
 from dataclasses import dataclass
 from typing import Callable
 
+import tqdm
+import tqdm.auto
+import tqdm.std
+
+# Captured at import, before any patch is installed, so installing twice
+# doesn't stack subclasses
+_original_tqdm = tqdm.std.tqdm
+
 
 @dataclass
 class ProgressEvent:
@@ -18,61 +26,117 @@ class ProgressEvent:
     started_at: float
 
 
-# Webhook-based progress tracking for cloud deployments
-_webhook_callback: Callable[[str, int, int], None] | None = None
+class WebhookTqdm(_original_tqdm):
+    """tqdm that reports tracked bars through the webhook callback."""
+
+    _sink: Callable[[str, int, int], None] | None = None
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        # Throttle checks only need a steady clock; have tqdm use the same
+        # monotonic source so update() reads a single timestamp
+        self._time = time.monotonic
+        self.start_t = self.last_print_t = self._time()
+        self._stage = kwargs.get("desc", "Processing")
+        self._tracked = False
+        self._last_sent = 0
+
+        callback = WebhookTqdm._sink
+        if callback and self.total and self.total > 0:
+            self._tracked = True
+            self._callback = callback
+            # Send initial progress
+            callback(self._stage, 0, self.total)
+
+    def update(self, n=1):
+        if self.disable:
+            return
+        # Skip tqdm's smoothing/rendering; only keep the counters its
+        # __iter__ fast path reads back after calling update()
+        self.n += n
+        self.last_print_n = self.n
+        self.last_print_t = now = self._time()
+        if self._tracked:
+            # Throttle updates to avoid overwhelming the API (max every 500ms)
+            if now - self._last_sent >= 0.5 or self.n >= self.total:
+                self._callback(self._stage, self.n, self.total)
+                self._last_sent = now
+
+    def close(self):
+        if self._tracked:
+            self._callback(self._stage, self.total, self.total)
+        super().close()
+
+
+class MPQueueTqdm(_original_tqdm):
+    """tqdm that reports tracked bars as ProgressEvents on a multiprocessing.Queue."""
+
+    _sink: Callable[[ProgressEvent], None] | None = None
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        # Throttle checks only need a steady clock; have tqdm use the same
+        # monotonic source so update() reads a single timestamp
+        self._time = time.monotonic
+        self.start_t = self.last_print_t = self._time()
+        self._stage = kwargs.get("desc", "Processing")
+        self._tracked = False
+        self._started_at = time.time()
+        self._last_sent = 0
+
+        if MPQueueTqdm._sink and self.total and self.total > 0:
+            self._tracked = True
+            self._send(0)
+
+    def _send(self, current):
+        # Every put pickles an event and wakes the feeder thread; the
+        # queue is unbounded, so this only fails once it's been closed
+        try:
+            MPQueueTqdm._sink(
+                ProgressEvent(self._stage, current, self.total, self._started_at)
+            )
+        except Exception:
+            pass
+
+    def update(self, n=1):
+        if self.disable:
+            return
+        self.n += n
+        self.last_print_n = self.n
+        self.last_print_t = now = self._time()
+        if self._tracked:
+            # Latest value wins: only the newest count per 500ms window is
+            # sent, the SSE stream would just overwrite the rest anyway
+            if now - self._last_sent >= 0.5 or self.n >= self.total:
+                self._send(self.n)
+                self._last_sent = now
+
+    def close(self):
+        if self._tracked:
+            self._send(self.total)
+        super().close()
+
+
+def _patch_tqdm(cls: type) -> None:
+    tqdm.tqdm = cls
+    tqdm.std.tqdm = cls
+    tqdm.auto.tqdm = cls
 
 
+# Webhook-based progress tracking for cloud deployments
 def set_webhook_callback(callback: Callable[[str, int, int], None] | None):
     """Set callback function for webhook-based progress reporting."""
-    global _webhook_callback
-    _webhook_callback = callback
+    WebhookTqdm._sink = callback
 
 
 def get_webhook_callback() -> Callable[[str, int, int], None] | None:
     """Get the current webhook callback."""
-    return _webhook_callback
+    return WebhookTqdm._sink
 
 
 def install_webhook_tqdm_patch():
     """Install tqdm patch that sends progress via webhook callback."""
-    import tqdm
-    import tqdm.auto
-    import tqdm.std
-
-    original_tqdm = tqdm.std.tqdm
-
-    class WebhookTqdm(original_tqdm):
-        def __init__(self, *args, **kwargs):
-            super().__init__(*args, **kwargs)
-            self._stage = kwargs.get("desc", "Processing")
-            self._tracked = False
-            self._last_sent = 0
-
-            callback = get_webhook_callback()
-            if callback and self.total and self.total > 0:
-                self._tracked = True
-                self._callback = callback
-                # Send initial progress
-                callback(self._stage, 0, self.total)
-
-        def update(self, n=1):
-            result = super().update(n)
-            if self._tracked:
-                # Throttle updates to avoid overwhelming the API (max every 500ms)
-                now = time.time()
-                if now - self._last_sent >= 0.5 or self.n >= self.total:
-                    self._callback(self._stage, self.n, self.total)
-                    self._last_sent = now
-            return result
-
-        def close(self):
-            if self._tracked:
-                self._callback(self._stage, self.total, self.total)
-            super().close()
-
-    tqdm.tqdm = WebhookTqdm
-    tqdm.std.tqdm = WebhookTqdm
-    tqdm.auto.tqdm = WebhookTqdm
+    _patch_tqdm(WebhookTqdm)
 
 
 def install_mp_tqdm_patch(progress_queue: mp.Queue):
@@ -81,49 +145,5 @@ def install_mp_tqdm_patch(progress_queue: mp.Queue):
     Used when running conversion in a subprocess. Must be called
     BEFORE any marker imports in the subprocess.
     """
-    import tqdm
-    import tqdm.auto
-    import tqdm.std
-
-    original_tqdm = tqdm.std.tqdm
-
-    class MPQueueTqdm(original_tqdm):
-        def __init__(self, *args, **kwargs):
-            super().__init__(*args, **kwargs)
-            self._stage = kwargs.get("desc", "Processing")
-            self._tracked = False
-            self._started_at = time.time()
-
-            if self.total and self.total > 0:
-                self._tracked = True
-                try:
-                    progress_queue.put_nowait(
-                        ProgressEvent(self._stage, 0, self.total, self._started_at)
-                    )
-                except Exception:
-                    pass
-
-        def update(self, n=1):
-            result = super().update(n)
-            if self._tracked:
-                try:
-                    progress_queue.put_nowait(
-                        ProgressEvent(self._stage, self.n, self.total, self._started_at)
-                    )
-                except Exception:
-                    pass
-            return result
-
-        def close(self):
-            if self._tracked:
-                try:
-                    progress_queue.put_nowait(
-                        ProgressEvent(self._stage, self.total, self.total, self._started_at)
-                    )
-                except Exception:
-                    pass
-            super().close()
-
-    tqdm.tqdm = MPQueueTqdm
-    tqdm.std.tqdm = MPQueueTqdm
-    tqdm.auto.tqdm = MPQueueTqdm
+    MPQueueTqdm._sink = progress_queue.put_nowait
+    _patch_tqdm(MPQueueTqdm)
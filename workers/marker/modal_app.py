@@ -9,7 +9,7 @@ MODEL_CACHE_PATH = "/root/.cache/datalab/"
 image = (
     modal.Image.debian_slim(python_version="3.11")
     .apt_install("build-essential")
-    .pip_install("marker-pdf==1.9.2", "httpx", "pydantic", "fastapi[standard]")
+    .pip_install("marker-pdf==1.9.2", "httpx", "orjson", "pydantic", "fastapi[standard]")
     .add_local_file(_here / "shared.py", "/root/shared.py")
 )
 
@@ -22,6 +22,8 @@ models_volume = modal.Volume.from_name("marker-models", create_if_missing=True)
     gpu="L40S",
     retries=3,
     timeout=1800,
+    # Keep an idle container (and its loaded models) around between jobs
+    scaledown_window=300,
     volumes={MODEL_CACHE_PATH: models_volume},
     secrets=[modal.Secret.from_name("google-api-key")],
 )
@@ -48,27 +50,27 @@ class Marker:
         page_range: str | None = None,
     ) -> dict:
         """Download file, convert with Marker, upload result to S3."""
-        import json
+        import gzip
         import tempfile
         import sys
         from pathlib import Path
 
         import httpx
+        import orjson
 
         sys.path.insert(0, "/root")
-        from shared import extract_chunks, encode_images
+        from shared import extract_chunks, encode_images, render_html_and_markdown
         from marker.config.parser import ConfigParser
         from marker.converters.pdf import PdfConverter
-        from marker.renderers.html import HTMLRenderer
-        from marker.renderers.markdown import MarkdownRenderer
 
         # Download
         suffix = Path(file_url.split("?")[0]).suffix or ".pdf"
         with tempfile.NamedTemporaryFile(delete=False, suffix=suffix) as f:
-            r = httpx.get(file_url, follow_redirects=True, timeout=60.0)
-            r.raise_for_status()
-            f.write(r.content)
             path = Path(f.name)
+            with httpx.stream("GET", file_url, follow_redirects=True, timeout=60.0) as r:
+                r.raise_for_status()
+                for chunk in r.iter_bytes(1 << 20):
+                    f.write(chunk)
 
         try:
             # Convert
@@ -87,22 +89,21 @@ class Marker:
             )
             doc = converter.build_document(str(path))
 
-            html = HTMLRenderer({"add_block_ids": True})(doc)
-            md = MarkdownRenderer()(doc)
+            rendered = render_html_and_markdown(doc)
             chunks = extract_chunks(doc)
 
             result = {
-                "content": html.html,
-                "metadata": html.metadata,
-                "formats": {"html": html.html, "markdown": md.markdown, "chunks": chunks},
-                "images": encode_images(html.images) if html.images else None,
+                "content": rendered["html"],
+                "metadata": rendered["metadata"],
+                "formats": {"html": rendered["html"], "markdown": rendered["markdown"], "chunks": chunks},
+                "images": encode_images(rendered["images"]) if rendered["images"] else None,
             }
 
-            # Upload to S3
+            # Upload to S3; stored gzip-encoded, so readers' fetch inflates it
             httpx.put(
                 result_upload_url,
-                content=json.dumps(result),
-                headers={"Content-Type": "application/json"},
+                content=gzip.compress(orjson.dumps(result), compresslevel=5),
+                headers={"Content-Type": "application/json", "Content-Encoding": "gzip"},
                 timeout=120.0,
             ).raise_for_status()
             return {"s3_result": True}
@@ -23,14 +23,51 @@ def extract_chunks(document):
     return None
 
 
-def encode_images(images: dict) -> dict[str, str]:
-    """Convert PIL images to base64 strings."""
+def render_html_and_markdown(document) -> dict:
+    """Render a Marker document to HTML and Markdown from a single render pass.
+
+    HTMLRenderer and MarkdownRenderer each render the block tree and crop
+    every image; MarkdownRenderer then runs markdownify over the same HTML.
+    Doing those steps once yields both outputs. Block ids only add attributes
+    and inline spans, which markdownify drops.
+    """
+    from bs4 import BeautifulSoup
+    from marker.renderers.markdown import MarkdownRenderer, cleanup_text
+
+    renderer = MarkdownRenderer({"add_block_ids": True})
+    document_output = document.render(renderer.block_config)
+    full_html, images = renderer.extract_html(document, document_output)
+
+    return {
+        # Same indentation HTMLRenderer applies
+        "html": BeautifulSoup(full_html, "html.parser").prettify(),
+        "markdown": cleanup_text(renderer.md_cls.convert(full_html)),
+        "images": images,
+        "metadata": renderer.generate_document_metadata(document, document_output),
+    }
+
+
+def _encode_image(img, jpeg_quality: int) -> str:
+    """Convert a single PIL image to a base64 JPEG string."""
     import base64
     import io
 
-    encoded = {}
-    for name, img in images.items():
-        buf = io.BytesIO()
-        img.save(buf, format="PNG")
-        encoded[name] = base64.b64encode(buf.getvalue()).decode()
-    return encoded
+    # JPEG can't hold alpha, palettes or 16-bit/CMYK-with-alpha modes
+    if img.mode != "RGB":
+        img = img.convert("RGB")
+    buf = io.BytesIO()
+    img.save(buf, format="JPEG", quality=jpeg_quality, optimize=True)
+    return base64.b64encode(buf.getvalue()).decode()
+
+
+def encode_images(images: dict, jpeg_quality: int = 85) -> dict[str, str]:
+    """Convert PIL images to base64 JPEG strings, encoding them in parallel.
+
+    Pillow releases the GIL while compressing, so a thread pool spreads the
+    work across the container's CPUs.
+    """
+    from concurrent.futures import ThreadPoolExecutor
+
+    with ThreadPoolExecutor(max_workers=4) as pool:
+        encoded = pool.map(lambda img: _encode_image(img, jpeg_quality), images.values())
+        return dict(zip(images.keys(), encoded))
@@ -27,6 +27,11 @@ def get_or_create_model() -> "Qwen3TTSModel":
     for reuse across all synthesis requests.
     """
     global _model_cache
+    # Skip the lock once loaded; unload_model() swaps in None atomically, so a
+    # caller racing it gets either the live model or falls through to reload
+    model = _model_cache
+    if model is not None:
+        return model
     with _model_lock:
         if _model_cache is None:
             device = get_device()
@@ -60,7 +65,6 @@ def unload_model() -> bool:
             return False
 
         print("[models] Unloading Qwen3-TTS model...", flush=True)
-        del _model_cache
         _model_cache = None
 
         if torch.cuda.is_available():
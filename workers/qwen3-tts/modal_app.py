@@ -1,36 +1,42 @@
 """Modal worker for Qwen3-TTS."""
 import modal
+import re
+import unicodedata
 from pathlib import Path
 
 # Get the path to voices directory relative to this file
 VOICES_DIR = Path(__file__).parent / "voices"
 
-# Pre-built flash-attn wheel for Python 3.11 + PyTorch 2.5 + CUDA 12
-FLASH_ATTN_WHEEL = (
-    "https://github.com/Dao-AILab/flash-attention/releases/download/v2.8.3/"
-    "flash_attn-2.8.3+cu12torch2.5cxx11abiFALSE-cp311-cp311-linux_x86_64.whl"
-)
-
 image = (
     modal.Image.debian_slim(python_version="3.11")
     .apt_install("build-essential", "ffmpeg", "libsndfile1", "sox")
     .pip_install(
         "torch==2.5.*",
         "torchaudio==2.5.*",
+        "torchao==0.8.*",
         "qwen-tts",
-        "scipy",
+        "numba",
+        "soundfile",
         "pydantic",
         "fastapi[standard]",
         "huggingface_hub[hf_transfer]",
-        FLASH_ATTN_WHEEL,
     )
-    .env({"HF_HUB_ENABLE_HF_TRANSFER": "1"})
+    .env({
+        "HF_HUB_ENABLE_HF_TRANSFER": "1",
+        # Keep Inductor's compiled kernels on disk so recompiles hit the cache
+        "TORCHINDUCTOR_CACHE_DIR": "/root/.inductor-cache",
+        "TORCHINDUCTOR_FX_GRAPH_CACHE": "1",
+    })
     .run_commands(
-        # Pre-download Qwen3-TTS model
-        "python -c \"import torch; from qwen_tts import Qwen3TTSModel; Qwen3TTSModel.from_pretrained('Qwen/Qwen3-TTS-12Hz-1.7B-Base', device_map='cpu', dtype=torch.bfloat16)\"",
+        # Pre-download the whole Qwen3-TTS repo (parallel via hf_transfer) without
+        # instantiating the model at build time. It includes the speech_tokenizer/
+        # subfolder and processor files that from_pretrained also loads.
+        "python -c \"from huggingface_hub import snapshot_download; snapshot_download('Qwen/Qwen3-TTS-12Hz-1.7B-Base')\"",
         # Pre-download MMS alignment model
         "python -c \"from torchaudio.pipelines import MMS_FA; MMS_FA.get_model()\"",
     )
+    # Everything is cached above, so loading never goes back to the Hub
+    .env({"HF_HUB_OFFLINE": "1"})
     .add_local_dir(VOICES_DIR, remote_path="/voices")
 )
 
@@ -39,13 +45,70 @@ app = modal.App("qwen3-tts", image=image)
 # Change this to invalidate the snapshot cache
 snapshot_key = "v1"
 
+# Voice configs
+VOICES = {
+    "male_1": {
+        "prompt_file": "/voices/male_1.pt",
+        "temperature": 0.9,
+        "top_p": 1.0,
+        "post_process": True,
+    },
+}
+
+# Most segments generated together in one synthesize_batch pass
+MAX_BATCH_SIZE = 8
+
+# Duplicate /result polls for a running call within this window reuse its
+# "pending" answer. Finished answers carry the WAV inline and aren't kept.
+PENDING_TTL_S = 0.1
+
+# Combining accents left after NFKD (é -> e + U+0301), dropped to keep the base letter
+_COMBINING_MARKS = re.compile(r"[\u0300-\u036f]")
+# Anything else MMS can't align becomes a word break
+_NON_ALIGNABLE = re.compile(r"[^a-z']+")
+
 # Import in global scope so imports can be snapshot
 with image.imports():
+    import numpy as np
+    import soundfile as sf
     import torch
+    import torchaudio
+    from numba import njit
     from qwen_tts import Qwen3TTSModel
+    from qwen_tts.inference.qwen3_tts_model import VoiceClonePromptItem
+    from torchao.quantization import int4_weight_only, quantize_
     from torchaudio.pipelines import MMS_FA
 
 
+def _compress_samples(audio, threshold_db, ratio, attack_coef, release_coef):
+    """Compress one generated clip, then peak-normalize it to 0.99.
+
+    Voices with post_process set run every clip of a batch through this, so
+    it is one pass per sample: dB level, smoothed gain reduction and the
+    applied gain are scalars carried through the loop rather than arrays.
+    load_model jit-compiles it with Numba before the snapshot.
+    """
+    compressed = np.empty_like(audio)
+    slope = 1 - 1 / ratio
+    current = 0.0
+    peak = 0.0
+    for i in range(audio.shape[0]):
+        sample = audio[i]
+        level_db = 20 * np.log10(abs(sample) + 1e-10)
+        target = max(level_db - threshold_db, 0.0) * slope
+        coef = attack_coef if target > current else release_coef
+        current = coef * current + (1 - coef) * target
+        out = sample * 10 ** (-current / 20)
+        compressed[i] = out
+        peak = max(peak, abs(out))
+
+    if peak > 0:
+        scale = 0.99 / peak
+        for i in range(compressed.shape[0]):
+            compressed[i] *= scale
+    return compressed
+
+
 @app.cls(
     gpu="A10G",
     cpu=2.0,
@@ -65,135 +128,244 @@ class Qwen3TTS:
             "Qwen/Qwen3-TTS-12Hz-1.7B-Base",
             device_map=device,
             dtype=torch.bfloat16,
-            attn_implementation="flash_attention_2",
+            # PyTorch's fused SDPA kernels; no flash-attn wheel to ship
+            attn_implementation="sdpa",
         )
         print(f"[qwen3-tts] Model loaded on {device}", flush=True)
 
+        # Decoding the talker's backbone at batch 1 is bound by weight reads;
+        # int4 weight-only quantization cuts them ~4x. The code predictor,
+        # speech decoder and alignment model stay bf16.
+        talker = self.model.model.talker
+        quantize_(talker.model, int4_weight_only(group_size=128))
+
+        # Compile the talker's transformer backbone, which runs once per
+        # generated frame (Inductor picks the int4 tinygemm kernels). Default
+        # mode rather than reduce-overhead: the KV cache grows every step, so
+        # CUDA graphs would re-record per length
+        torch.set_float32_matmul_precision("high")
+        talker.model.forward = torch.compile(talker.model.forward, dynamic=True)
+
         print("[qwen3-tts] Loading MMS alignment model...", flush=True)
-        self.align_model = MMS_FA.get_model().to(device)
-        self.align_tokenizer = MMS_FA.get_tokenizer()
-        self.align_aligner = MMS_FA.get_aligner()
+        # synthesize_batch hands _align_batch up to MAX_BATCH_SIZE zero-padded
+        # clips. Left on, the bundle's waveform normalization would take its
+        # statistics over the padding too, so _align_batch layer-norms each
+        # clip itself; the extra star-token column is dropped since no
+        # transcript here uses it and it can't be appended past batch size 1.
+        self.align_model = MMS_FA.get_model(with_star=False).to(device)
+        self.align_model.normalize_waveform = False
+        # Character -> MMS token id; normalized transcripts only hold a-z and '
+        self.align_token_lut = np.zeros(128, dtype=np.int32)
+        for char, index in MMS_FA.get_dict().items():
+            if len(char) == 1 and ord(char) < 128:
+                self.align_token_lut[ord(char)] = index
         self.align_sample_rate = MMS_FA.sample_rate
         self.device = device
+
+        # Compile the compressor's per-sample loop now so requests don't pay for it
+        self._compress_samples = njit(cache=True, fastmath=True)(_compress_samples)
+        self._compress_samples(np.zeros(1024, dtype=np.float32), -20.0, 4.0, 0.5, 0.5)
+
+        # Parse each voice clone prompt once, with its tensors already on the GPU
+        self.voice_prompts = {}
+        for voice_id, voice in VOICES.items():
+            prompt = torch.load(voice["prompt_file"], weights_only=False, map_location=device)
+            self.voice_prompts[voice_id] = [VoiceClonePromptItem(**item) for item in prompt["items"]]
+
+        # Run one generation so compilation happens before the snapshot; under
+        # inference mode like requests, so the compiled graph's guards match
+        print("[qwen3-tts] Warming up compiled model...", flush=True)
+        with torch.inference_mode():
+            _, sr = self.model.generate_voice_clone(
+                text="Warming up the model.",
+                language="english",
+                voice_clone_prompt=self.voice_prompts["male_1"],
+            )
+
+        # Build the 16kHz resampler for the model's output rate once, on the
+        # GPU, instead of recomputing the sinc kernel on the CPU per request
+        self.resamplers = {sr: torchaudio.transforms.Resample(sr, self.align_sample_rate).to(device)}
+
+        # Staging buffers for alignment input (a minute of audio, grown on demand),
+        # so clips reach the GPU via async copies from pinned memory
+        self._alloc_align_buffers(sr * 60)
         print(f"[qwen3-tts] Ready, snapshotting {snapshot_key}", flush=True)
 
     @modal.method()
     def synthesize(self, text: str, voice_id: str) -> dict:
         """Synthesize speech from text with word-level timestamps."""
+        if voice_id not in VOICES:
+            return {"error": f"Unknown voice: {voice_id}. Available: {list(VOICES.keys())}"}
+
+        return self._render_batch([text], voice_id)[0]
+
+    @modal.method()
+    def synthesize_batch(self, segments: list[dict]) -> list[dict]:
+        """Synthesize several {text, voice_id} segments in one call.
+
+        Segments sharing a voice are generated together in batches of similar
+        length and aligned with one MMS forward pass per batch. Results come
+        back in input order.
+
+        Not used by the web server yet: ModalTTSBackend still sends one segment
+        per /synthesize call, which runs the same path with a batch of one.
+        """
+        results: list[dict | None] = [None] * len(segments)
+        by_voice: dict[str, list[int]] = {}
+
+        for i, seg in enumerate(segments):
+            voice_id = seg.get("voice_id", "male_1")
+            if voice_id not in VOICES:
+                results[i] = {"error": f"Unknown voice: {voice_id}. Available: {list(VOICES.keys())}"}
+            else:
+                by_voice.setdefault(voice_id, []).append(i)
+
+        for voice_id, indices in by_voice.items():
+            # Sort by length so each batch stops generating at about the same time
+            indices.sort(key=lambda i: len(segments[i].get("text", "")))
+            for start in range(0, len(indices), MAX_BATCH_SIZE):
+                chunk = indices[start : start + MAX_BATCH_SIZE]
+                texts = [segments[i].get("text", "") for i in chunk]
+                for i, out in zip(chunk, self._render_batch(texts, voice_id)):
+                    results[i] = out
+        return results
+
+    def _render_batch(self, texts: list[str], voice_id: str) -> list[dict]:
+        """Generate, align and post-process segments for one voice in a single batch."""
         import base64
         import io
-        import numpy as np
-        from scipy.io import wavfile
-        from qwen_tts.inference.qwen3_tts_model import VoiceClonePromptItem
-
-        # Voice configs
-        voices = {
-            "male_1": {
-                "prompt_file": "/voices/male_1.pt",
-                "temperature": 0.9,
-                "top_p": 1.0,
-                "post_process": True,
-            },
-        }
-
-        if voice_id not in voices:
-            return {"error": f"Unknown voice: {voice_id}. Available: {list(voices.keys())}"}
-
-        voice = voices[voice_id]
-
-        # Load voice clone prompt
-        prompt = torch.load(voice["prompt_file"], weights_only=False)
-        prompt_items = [VoiceClonePromptItem(**item) for item in prompt["items"]]
-
-        # Generate audio
-        wavs, sr = self.model.generate_voice_clone(
-            text=text,
-            language="english",
-            voice_clone_prompt=prompt_items,
-            temperature=voice["temperature"],
-            top_p=voice["top_p"],
-        )
-        audio = wavs[0]
-
-        # Get word timestamps using MMS alignment
-        audio_tensor = torch.from_numpy(audio)
-        word_timestamps = self._get_word_timestamps(audio_tensor, text, sr)
-
-        # Apply compression if configured
-        if voice["post_process"]:
-            audio = self._compress(audio, sr)
-
-        # Calculate duration
-        duration_ms = len(audio) / sr * 1000
-
-        # Convert to WAV bytes
-        audio_int16 = (audio * 32767).astype(np.int16)
-        buffer = io.BytesIO()
-        wavfile.write(buffer, sr, audio_int16)
-        wav_bytes = buffer.getvalue()
-
-        return {
-            "audio": base64.b64encode(wav_bytes).decode("utf-8"),
-            "sampleRate": sr,
-            "durationMs": duration_ms,
-            "wordTimestamps": word_timestamps,
-        }
-
-    def _get_word_timestamps(self, audio_tensor, text: str, sr: int) -> list[dict]:
-        """Compute word-level timestamps using MMS alignment."""
-        import torchaudio.functional as F
 
-        # Resample to MMS sample rate (16kHz)
+        voice = VOICES[voice_id]
+
+        # Nothing here needs autograd, so skip its version counters and view
+        # tracking for generation and alignment alike
+        with torch.inference_mode():
+            # Generate audio; a single prompt item is shared across the batch
+            wavs, sr = self.model.generate_voice_clone(
+                text=texts,
+                language="english",
+                voice_clone_prompt=self.voice_prompts[voice_id],
+                temperature=voice["temperature"],
+                top_p=voice["top_p"],
+            )
+
+            # Get word timestamps using MMS alignment
+            all_timestamps = self._align_batch(wavs, texts, sr)
+
+        results = []
+        for audio, word_timestamps in zip(wavs, all_timestamps):
+            # Apply compression if configured
+            if voice["post_process"]:
+                audio = self._compress(audio, sr)
+
+            # Calculate duration
+            duration_ms = len(audio) / sr * 1000
+
+            # Convert to 16-bit WAV bytes; libsndfile quantizes while writing
+            buffer = io.BytesIO()
+            sf.write(buffer, audio, sr, subtype="PCM_16", format="WAV")
+            wav_bytes = buffer.getvalue()
+
+            results.append({
+                "audio": base64.b64encode(wav_bytes).decode("utf-8"),
+                "sampleRate": sr,
+                "durationMs": duration_ms,
+                "wordTimestamps": word_timestamps,
+            })
+        return results
+
+    def _alloc_align_buffers(self, num_samples: int):
+        """(Re)allocate the pinned host and device buffers used to stage alignment input."""
+        pin = self.device == "cuda"
+        self._host_buf = torch.empty(num_samples, dtype=torch.float32, pin_memory=pin)
+        self._dev_buf = torch.empty(num_samples, dtype=torch.float32, device=self.device)
+
+    def _stage_clips(self, audio_arrays: list) -> list:
+        """Copy clips to the alignment device through the reused staging buffers."""
+        lengths = [len(audio) for audio in audio_arrays]
+        total = sum(lengths)
+        if total > self._host_buf.numel():
+            self._alloc_align_buffers(total)
+
+        # Write all clips straight into pinned memory, then issue one async H2D copy
+        np.concatenate(audio_arrays, out=self._host_buf[:total].numpy(), casting="same_kind")
+        staged = self._dev_buf[:total]
+        staged.copy_(self._host_buf[:total], non_blocking=True)
+        return list(torch.split(staged, lengths))
+
+    def _align_batch(self, audio_arrays: list, texts: list[str], sr: int) -> list[list[dict]]:
+        """Compute word-level timestamps for several clips with one MMS forward pass."""
+        from torch.nn.utils.rnn import pad_sequence
+
+        # Move to the alignment device, then resample to MMS sample rate (16kHz)
+        # and normalize there
+        waveforms = self._stage_clips(audio_arrays)
         if sr != self.align_sample_rate:
-            audio_resampled = F.resample(audio_tensor.unsqueeze(0), sr, self.align_sample_rate).squeeze(0)
-        else:
-            audio_resampled = audio_tensor
+            if sr not in self.resamplers:
+                self.resamplers[sr] = torchaudio.transforms.Resample(sr, self.align_sample_rate).to(self.device)
+            waveforms = [self.resamplers[sr](waveform) for waveform in waveforms]
+        waveforms = [torch.nn.functional.layer_norm(w, w.shape) for w in waveforms]
 
-        # Ensure correct shape [1, T]
-        if audio_resampled.dim() == 1:
-            audio_resampled = audio_resampled.unsqueeze(0)
+        lengths = torch.tensor([w.shape[-1] for w in waveforms], device=self.device)
+        batch = pad_sequence(waveforms, batch_first=True)
 
-        waveform = audio_resampled.to(self.device)
+        # Generate emissions; padded frames are cut off per row below
+        emissions, emission_lengths = self.align_model(batch, lengths)
 
-        # Generate emissions
-        with torch.inference_mode():
-            emission, _ = self.align_model(waveform)
+        return [
+            self._word_timestamps(emissions[i : i + 1, : emission_lengths[i]], int(lengths[i]), text)
+            for i, text in enumerate(texts)
+        ]
+
+    def _word_timestamps(self, emission, num_samples: int, text: str) -> list[dict]:
+        """Force-align text against one clip's emissions and return word timings."""
+        import torchaudio.functional as F
 
-        # Normalize text: MMS expects lowercase, only a-z and apostrophe
-        normalized = text.lower()
-        normalized = "".join(c if c.isalpha() or c in "' " else " " for c in normalized)
-        words = normalized.split()
+        # Normalize text: MMS expects lowercase, only a-z and apostrophe.
+        # Accents are folded to their base letter first (é -> e).
+        folded = _COMBINING_MARKS.sub("", unicodedata.normalize("NFKD", text))
+        # Runs of non-alignable characters collapse to one space, so after the
+        # strip words are separated by exactly one space
+        normalized = _NON_ALIGNABLE.sub(" ", folded.lower()).strip()
 
-        if not words:
+        if not normalized:
             return []
 
-        # Tokenize and align using bundle's high-level APIs
-        tokens = self.align_tokenizer(words)
-        token_spans = self.align_aligner(emission[0], tokens)
+        # One pass over the normalized bytes yields both the character stream
+        # and the word boundaries: the k-th space sits after k words' worth of
+        # characters plus k earlier spaces
+        buf = np.frombuffer(normalized.encode("ascii"), dtype=np.uint8)
+        is_space = buf == ord(" ")
+        chars = buf[~is_space]
+        spaces = np.flatnonzero(is_space)
+        word_ends = np.append(spaces - np.arange(len(spaces)), len(chars))
+        word_starts = np.concatenate(([0], word_ends[:-1]))
+
+        # Tokenize every character through the lookup table, then force-align
+        # them all in one pass
+        targets = torch.from_numpy(self.align_token_lut[chars]).unsqueeze(0).to(self.device)
+        alignments, _ = F.forced_align(emission, targets, blank=0)
+        # One device sync for the whole frame path
+        frames = alignments[0].cpu().numpy()
+
+        # Each character is a run of its label in the frame path; runs of the
+        # blank label (0) sit between them. Boundaries are where the label changes.
+        bounds = np.flatnonzero(np.diff(frames, prepend=-1, append=-1))
+        run_starts, run_ends = bounds[:-1], bounds[1:]
+        is_char = frames[run_starts] != 0
+        char_starts, char_ends = run_starts[is_char], run_ends[is_char]
 
         # Convert frame indices to milliseconds
         num_frames = emission.shape[1]
-        ratio = waveform.shape[1] / num_frames / self.align_sample_rate
+        ms_per_frame = num_samples / num_frames / self.align_sample_rate * 1000
+        # A word spans from its first character's start to its last character's end
+        start_ms = np.round(char_starts[word_starts] * ms_per_frame, 1).tolist()
+        end_ms = np.round(char_ends[word_ends - 1] * ms_per_frame, 1).tolist()
 
-        results = []
-        for i, span in enumerate(token_spans):
-            # Handle both single TokenSpan and list of TokenSpans per word
-            if isinstance(span, list):
-                word_start = span[0].start if span else 0
-                word_end = span[-1].end if span else 0
-            else:
-                word_start = span.start
-                word_end = span.end
-
-            start_ms = word_start * ratio * 1000
-            end_ms = word_end * ratio * 1000
-            results.append({
-                "word": words[i],
-                "startMs": round(start_ms, 1),
-                "endMs": round(end_ms, 1),
-            })
-
-        return results
+        return [
+            {"word": word, "startMs": start, "endMs": end}
+            for word, start, end in zip(normalized.split(" "), start_ms, end_ms)
+        ]
 
     def _compress(
         self,
@@ -205,31 +377,19 @@ class Qwen3TTS:
         release_ms: float = 50,
     ):
         """Apply dynamic range compression."""
-        import numpy as np
-
-        eps = 1e-10
-        audio_db = 20 * np.log10(np.abs(audio) + eps)
-        over_threshold = np.maximum(audio_db - threshold_db, 0)
-        gain_reduction_db = over_threshold * (1 - 1 / ratio)
+        attack_coef = np.exp(-1 / (attack_ms / 1000 * sr)) if attack_ms > 0 else 0.0
+        release_coef = np.exp(-1 / (release_ms / 1000 * sr)) if release_ms > 0 else 0.0
 
-        attack_coef = np.exp(-1 / (attack_ms / 1000 * sr)) if attack_ms > 0 else 0
-        release_coef = np.exp(-1 / (release_ms / 1000 * sr)) if release_ms > 0 else 0
-
-        smoothed_gr = np.zeros_like(gain_reduction_db)
-        current = 0.0
-        for i in range(len(gain_reduction_db)):
-            target = gain_reduction_db[i]
-            coef = attack_coef if target > current else release_coef
-            current = coef * current + (1 - coef) * target
-            smoothed_gr[i] = current
-
-        compressed = audio * 10 ** (-smoothed_gr / 20)
-        return compressed / np.max(np.abs(compressed)) * 0.99
+        return self._compress_samples(
+            audio, float(threshold_db), float(ratio), float(attack_coef), float(release_coef)
+        )
 
 
 @app.function()
 @modal.asgi_app()
 def api():
+    import time
+
     from fastapi import FastAPI
     from pydantic import BaseModel
 
@@ -251,15 +411,38 @@ def api():
             calls.append(call.object_id)
         return {"call_ids": calls}
 
+    @web.post("/synthesize_batch")
+    async def synthesize_batch(req: SynthesizeRequest):
+        """Spawn all segments as one call; its result holds them in order.
+
+        No caller in the web server yet; see Qwen3TTS.synthesize_batch.
+        """
+        call = await worker.synthesize_batch.spawn.aio(req.segments)
+        return {"call_id": call.object_id}
+
+    # call_id -> expiry, for calls last seen still running
+    pending: dict[str, float] = {}
+
     @web.get("/result/{call_id}")
     async def result(call_id: str):
+        now = time.monotonic()
+        if pending.get(call_id, 0.0) > now:
+            return {"status": "pending"}
+
         fc = modal.FunctionCall.from_id(call_id)
         try:
             out = await fc.get.aio(timeout=0)
-            return {"status": "completed", **out}
         except TimeoutError:
+            pending[call_id] = now + PENDING_TTL_S
             return {"status": "pending"}
 
+        # Forget expired pending entries, including this call's
+        for key in [k for k, expiry in pending.items() if expiry <= now]:
+            del pending[key]
+        if isinstance(out, list):
+            return {"status": "completed", "results": out}
+        return {"status": "completed", **out}
+
     @web.get("/voices")
     async def voices():
         return {"voices": [